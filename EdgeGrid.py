@@ -0,0 +1,281 @@
+from Lav import *
+import math
+
+class EdgeGrid:
+    """
+    Index over the live LAV edges of every contour in rings, for the split
+    events. Every live vertex owns the edge that leaves it (vertex ->
+    vertex.next), so edges are stored by their left vertex.
+    Each LAV edge is placed over the cells of the polygon it sweeps for a
+    while, each reflex vertex over the segment of its ray it travels in
+    that time, so a split can only happen where both are placed. Each
+    placement keeps a clock giving the time it is at every point, and only
+    placements over a cell at the same time meet there.
+    Sweeps go to the level of a grid pyramid where they take a few cells,
+    rays to every level. Buckets are insertion ordered dicts, so
+    candidates come out in the same order on every run.
+    """
+    # A ray found by a LAV edge costs about as much as this many cells stored
+    RAY_COST = 16
+
+    def __init__(self, rings, cellSize=None):
+        xs = [p.x for points in rings for p in points]
+        ys = [p.y for points in rings for p in points]
+        self.minX = min(xs)
+        self.minY = min(ys)
+        self.maxX = max(xs)
+        self.maxY = max(ys)
+
+        if cellSize is None:
+            # Average edge length keeps roughly one edge per cell
+            n = len(xs)
+            perimeter = sum(((points[i].x - points[i - 1].x) ** 2 + (points[i].y - points[i - 1].y) ** 2) ** 0.5
+                            for points in rings for i in range(len(points)))
+            cellSize = perimeter / n if n and perimeter > 0 else 1.0
+            # Long spiky edges would leave a handful of cells over the whole outline
+            cellSize = min(cellSize, max(self.maxX - self.minX, self.maxY - self.minY) / max(1, n) ** 0.5) or 1.0
+        self.cellSize = cellSize
+        # The top level has a single cell over the whole box
+        span = max(self.maxX - self.minX, self.maxY - self.minY, cellSize)
+        self.levels = max(0, math.ceil(math.log2(span / cellSize))) + 1
+        # Cells over the box and ray placements at every level, for the density of the rays
+        self.levelCells = [max(1, math.ceil((self.maxX - self.minX) / (cellSize * 2 ** level)))
+                           * max(1, math.ceil((self.maxY - self.minY) / (cellSize * 2 ** level)))
+                           for level in range(self.levels)]
+        self.levelRays = [0] * self.levels
+
+        self.byEdge = {}
+        self.edgeCells = {}
+        self.rayCells = {}
+        self.edgeKeys = {}
+        self.rayKeys = {}
+
+    def _cell(self, x, y, size):
+        return (int(math.floor((x - self.minX) / size)),
+                int(math.floor((y - self.minY) / size)))
+
+    def _segmentCells(self, a, b, size):
+        # Every cell crossed by the segment ab, walking column by column
+        i0, j0 = self._cell(a.x, a.y, size)
+        i1, j1 = self._cell(b.x, b.y, size)
+        if i0 == i1:
+            return [(i0, j) for j in range(min(j0, j1), max(j0, j1) + 1)]
+
+        if i0 > i1:
+            a, b = b, a
+            i0, i1 = i1, i0
+        slope = (b.y - a.y) / (b.x - a.x)
+        cells = []
+        for i in range(i0, i1 + 1):
+            xa = max(a.x, self.minX + i * size)
+            xb = min(b.x, self.minX + (i + 1) * size)
+            ja = self._cell(xa, a.y + (xa - a.x) * slope, size)[1]
+            jb = self._cell(xb, a.y + (xb - a.x) * slope, size)[1]
+            for j in range(min(ja, jb), max(ja, jb) + 1):
+                cells.append((i, j))
+        return cells
+
+    def clip(self, point:Point, direction:Point, length):
+        # Part of the segment from point along direction that lies in the box, None if it misses
+        low, high = 0.0, length
+        for start, step, lo, hi in ((point.x, direction.x, self.minX, self.maxX),
+                                    (point.y, direction.y, self.minY, self.maxY)):
+            if step == 0:
+                if start < lo or start > hi:
+                    return None
+                continue
+            near, far = (lo - start) / step, (hi - start) / step
+            if near > far:
+                near, far = far, near
+            low, high = max(low, near), min(high, far)
+        if low > high:
+            return None
+        return point + direction * low, point + direction * high
+
+    def insert(self, vertex:Vertex):
+        self.byEdge.setdefault(vertex.edgeRight, {})[vertex] = None
+
+    def remove(self, vertex:Vertex):
+        owners = self.byEdge.get(vertex.edgeRight)
+        if owners is not None:
+            owners.pop(vertex, None)
+            if not owners:
+                del self.byEdge[vertex.edgeRight]
+        self._drop(vertex, self.edgeKeys, self.edgeCells)
+        self._dropRay(vertex)
+
+    def update(self, vertex:Vertex):
+        # A live vertex keeps its LAV edge placed over what it swept, until it is placed again
+        if not vertex.isAlive or vertex.next is None:
+            self.remove(vertex)
+            return
+        self.insert(vertex)
+        self._dropRay(vertex)
+
+    def verticesOnEdge(self, edge:Edge):
+        # Live vertices whose outgoing LAV edge lies on the given original edge
+        return self.byEdge.get(edge, ())
+
+    def _drop(self, vertex, keys, cells):
+        for key in keys.pop(vertex, ()):
+            bucket = cells[key]
+            bucket.pop(vertex, None)
+            if not bucket:
+                del cells[key]
+
+    def _dropRay(self, vertex):
+        for key in self.rayKeys.get(vertex, ()):
+            self.levelRays[key[0]] -= 1
+        self._drop(vertex, self.rayKeys, self.rayCells)
+
+    def _polygonCells(self, corners, size):
+        # Every cell the convex polygon through corners overlaps inside the box, column by column
+        xs = [p.x for p in corners]
+        ys = [p.y for p in corners]
+        minX, minY = self.minX, self.minY
+        x0, x1 = max(minX, min(xs)), min(self.maxX, max(xs))
+        y0, y1 = max(minY, min(ys)), min(self.maxY, max(ys))
+        if x0 > x1 or y0 > y1:
+            return []
+        i0, i1 = int((x0 - minX) // size), int((x1 - minX) // size)
+        if i0 == i1:
+            return [(i0, j) for j in range(int((y0 - minY) // size), int((y1 - minY) // size) + 1)]
+        sides = [(a.x, a.y, b.x, b.y) for a, b in zip(corners, corners[1:] + corners[:1])]
+        cells = []
+        for i in range(i0, i1 + 1):
+            xa, xb = minX + i * size, minX + (i + 1) * size
+            if xa < x0:
+                xa = x0
+            if xb > x1:
+                xb = x1
+            low, high = math.inf, -math.inf
+            for ax, ay, bx, by in sides:
+                if ax == bx:
+                    if xa <= ax <= xb:
+                        low, high = min(low, ay, by), max(high, ay, by)
+                    continue
+                ta, tb = (xa - ax) / (bx - ax), (xb - ax) / (bx - ax)
+                if ta > tb:
+                    ta, tb = tb, ta
+                if ta < 0.0:
+                    ta = 0.0
+                if tb > 1.0:
+                    tb = 1.0
+                if ta <= tb:
+                    ya, yb = ay + (by - ay) * ta, ay + (by - ay) * tb
+                    if ya > yb:
+                        ya, yb = yb, ya
+                    if ya < low:
+                        low = ya
+                    if yb > high:
+                        high = yb
+            if low < y0:
+                low = y0
+            if high > y1:
+                high = y1
+            if low <= high:
+                cells.extend((i, j) for j in range(int((low - minY) // size), int((high - minY) // size) + 1))
+        return cells
+
+    def sweepKeys(self, corners):
+        """
+        Cells of the convex polygon through corners, in order, at the level
+        where the cells it takes and the rays it may find there cost the
+        least. A long thin sweep among many rays stays on a fine level.
+        """
+        sides = list(zip(corners, corners[1:] + corners[:1]))
+        area = abs(sum(a.x * b.y - a.y * b.x for a, b in sides)) / 2
+        perimeter = sum(((b.x - a.x) ** 2 + (b.y - a.y) ** 2) ** 0.5 for a, b in sides)
+        best, bestCost = 0, math.inf
+        size = self.cellSize
+        for level, factor in enumerate(self.cellCosts()):
+            cost = (area / size ** 2 + perimeter / size + 1) * factor
+            if cost < bestCost:
+                best, bestCost = level, cost
+            size *= 2
+        return [(best, i, j) for i, j in self._polygonCells(list(corners), self.cellSize * 2 ** best)]
+
+    def cellCosts(self):
+        # Cost of a cell stored at every level, with the rays it may find there
+        return [1 + self.RAY_COST * rays / cells for rays, cells in zip(self.levelRays, self.levelCells)]
+
+    def segmentKeys(self, a:Point, b:Point):
+        # Cells of the segment ab at every level
+        keys = []
+        size = self.cellSize
+        for level in range(self.levels):
+            keys.extend((level, i, j) for i, j in self._segmentCells(a, b, size))
+            size *= 2
+        return keys
+
+    def raysOver(self, keys):
+        # Ray placements over the cells, each counted once per cell
+        return sum(len(self.rayCells.get(key, ())) for key in keys)
+
+    def edgesOver(self, keys):
+        return sum(len(self.edgeCells.get(key, ())) for key in keys)
+
+    def _span(self, key, clock, begin, end):
+        # Times between begin and end the placement with clock (c, gx, gy), at c + gx*x + gy*y
+        # over the point (x, y), is over the cell of key, with some slack for rounding
+        if clock is None:
+            return begin, end
+        level, i, j = key
+        size = self.cellSize * 2 ** level
+        c, gx, gy = clock
+        corner = c + gx * (self.minX + i * size) + gy * (self.minY + j * size)
+        low = corner + (min(gx, 0.0) + min(gy, 0.0)) * size
+        high = corner + (max(gx, 0.0) + max(gy, 0.0)) * size
+        slack = 1e-9 * (1 + abs(low) + abs(high))
+        return max(begin, low - slack), min(end, high + slack)
+
+    def _place(self, vertex, keys, clock, begin, end, cells, others):
+        # Cells keep (clock, begin, end) of the placement, and the times over the cell once
+        # worked out as (None, low, high), only where there is something to meet
+        found = {}
+        placement = (clock, begin, end)
+        for key in keys:
+            bucket = others.get(key)
+            if not bucket:
+                cells.setdefault(key, {})[vertex] = placement
+                continue
+            low, high = self._span(key, clock, begin, end)
+            cells.setdefault(key, {})[vertex] = (None, low, high)
+            for other, entry in bucket.items():
+                otherClock, otherLow, otherHigh = entry
+                if otherClock is not None:
+                    otherLow, otherHigh = self._span(key, otherClock, otherLow, otherHigh)
+                    bucket[other] = (None, otherLow, otherHigh)
+                if otherLow <= high and otherHigh >= low:
+                    meet = max(low, otherLow)
+                    if found.get(other, math.inf) > meet:
+                        found[other] = meet
+        return found
+
+    def placeEdge(self, vertex:Vertex, keys, clock, begin, end):
+        """
+        Stores the LAV edge of vertex over the cells of keys, from
+        sweepKeys, between the times begin and end, and returns the reflex
+        vertices placed over the same cells at the same time. The wavefront
+        line of the edge is over the point (x, y) at c + gx*x + gy*y for
+        the clock (c, gx, gy), None when unknown. Each vertex found maps to
+        the earliest time both are over one of the cells.
+        """
+        self._drop(vertex, self.edgeKeys, self.edgeCells)
+        self.edgeKeys[vertex] = keys
+        return self._place(vertex, keys, clock, begin, end, self.edgeCells, self.rayCells)
+
+    def placeRay(self, vertex:Vertex, keys, clock, begin, end):
+        """
+        Stores the ray of a reflex vertex over the cells of keys, from
+        segmentKeys, between the times begin and end, and returns the
+        vertices whose LAV edges are placed over the same cells at the same
+        time, mapped to the earliest time both are over one of the cells.
+        The vertex is at the point (x, y) along its ray at c + gx*x + gy*y
+        for the clock (c, gx, gy).
+        """
+        self._dropRay(vertex)
+        self.rayKeys[vertex] = keys
+        for key in keys:
+            self.levelRays[key[0]] += 1
+        return self._place(vertex, keys, clock, begin, end, self.rayCells, self.edgeCells)
@@ -1,6 +1,12 @@
 from geometry import *
+from Instrumentation import *
+import predicates
+import heapq
+import itertools
 
 class Event:
+    __slots__ = ('collision', 'time', 'eventType', 'vertexA', 'vertexB', 'opositeEdge', 'generation')
+
     def __init__(self, collision:Point, time, eventType, vertexA, vertexB = None, opositeEdge = None):
         self.collision = collision
         self.time = time
@@ -8,22 +14,89 @@ class Event:
         self.vertexA = vertexA
         self.vertexB = vertexB
         self.opositeEdge = opositeEdge
+        # An edge event only holds while the edge leaving vertexA is untouched
+        self.generation = vertexA.generation
 
     def isValid(self):
-        if not self.vertexA.isAlive:
-            return False
-        if self.eventType == 'edge' and not self.vertexB.isAlive:
-            return False
-        return True
-    
-    def isSimultaneous(eventA, eventB, eps=1e-6):
-        if (abs(eventA.time - eventB.time) < eps):
-            if eventA.eventType == 'edge' and eventB.eventType == 'edge':
-                return True 
-        return False
+        if self.eventType == 'edge':
+            return self.vertexA.generation == self.generation
+        return self.vertexA.isAlive
     
     def __lt__(eventA, eventB):
         return eventA.time < eventB.time
     
     def __repr__(self):
-        return f"Event type({self.eventType}), collision({self.collision}), time({self.time}) \n vertexA({self.vertexA.point}),\n vertexB({self.vertexB.point if self.vertexB else None})"
\ No newline at end of file
+        return f"Event type({self.eventType}), collision({self.collision}), time({self.time}) \n vertexA({self.vertexA.point}),\n vertexB({self.vertexB.point if self.vertexB else None})"
+
+
+class EventQueue:
+    """
+    Binary heap of (time, sequence, event) entries. The sequence number
+    breaks ties, so events are never compared with each other. With a
+    FixedGrid the time of an entry is the integer tick of the event time.
+    """
+    def __init__(self, eps=1e-6, instrumentation=None, minCompact=1024, grid=None):
+        self.heap = []
+        self.eps = eps
+        self.grid = grid
+        self.sequence = itertools.count()
+        self.stats = instrumentation if instrumentation is not None else NullInstrumentation()
+        # The heap is compacted once it doubles since the last compaction
+        self.minCompact = minCompact
+        self.compactAt = minCompact
+
+    def __len__(self):
+        return len(self.heap)
+
+    def key(self, time):
+        return time if self.grid is None else self.grid.ticks(time)
+
+    def push(self, event:Event):
+        heapq.heappush(self.heap, (self.key(event.time), next(self.sequence), event))
+        self.stats.pushed(len(self.heap))
+
+    def extend(self, events):
+        # Seeding many events at once is a single O(n) heapify
+        before = len(self.heap)
+        self.heap.extend((self.key(event.time), next(self.sequence), event) for event in events)
+        heapq.heapify(self.heap)
+        self.stats.pushed(len(self.heap), len(self.heap) - before)
+
+    def pop(self):
+        # Next valid event, stale ones are dropped on the way
+        while self.heap:
+            event = heapq.heappop(self.heap)[2]
+            valid = event.isValid()
+            self.stats.popped(valid)
+            if valid:
+                return event
+        return None
+
+    def popSimultaneous(self):
+        # Every valid event within eps of the earliest one, in time order
+        first = self.pop()
+        if first is None:
+            return []
+        events = [first]
+        if self.grid is None:
+            limit = first.time + predicates.tolerance(self.eps, first.time)
+        else:
+            limit = self.key(first.time) + self.grid.span(predicates.tolerance(self.eps, first.time))
+        while self.heap and self.heap[0][0] < limit:
+            event = heapq.heappop(self.heap)[2]
+            valid = event.isValid()
+            self.stats.popped(valid)
+            if valid:
+                events.append(event)
+        return events
+
+    def wantsCompaction(self):
+        return len(self.heap) > self.compactAt
+
+    def compact(self):
+        # Drops the stale entries, an invalid event never becomes valid again
+        before = len(self.heap)
+        self.heap = [entry for entry in self.heap if entry[2].isValid()]
+        heapq.heapify(self.heap)
+        self.stats.count("compacted", before - len(self.heap))
+        self.compactAt = max(self.minCompact, 2 * len(self.heap))
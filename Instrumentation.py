@@ -0,0 +1,100 @@
+import logging
+import time
+from contextlib import contextmanager, nullcontext
+
+_logger = logging.getLogger("straightSkeleton")
+
+class Instrumentation:
+    """
+    Counters, phase timers and per event hooks for StraightSkeleton.
+    Hooks are called as hook(kind, event) after each handled event, kind
+    being 'edge', 'split', 'cluster' or 'peak_of_roof'.
+    """
+    def __init__(self, logger=_logger):
+        self.enabled = True
+        self.logger = logger
+        self.counters = {
+            "pushed": 0,
+            "popped": 0,
+            "stale": 0,
+            "edge": 0,
+            "split": 0,
+            "cluster": 0,
+            "clustered": 0,
+            "peak_of_roof": 0,
+        }
+        self.maxQueue = 0
+        self.phases = {}
+        self.hooks = []
+
+    def addHook(self, hook):
+        self.hooks.append(hook)
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def pushed(self, queueSize, amount=1):
+        self.counters["pushed"] += amount
+        if queueSize > self.maxQueue:
+            self.maxQueue = queueSize
+
+    def popped(self, valid):
+        self.counters["popped"] += 1
+        if not valid:
+            self.counters["stale"] += 1
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+            self.logger.info("phase %s took %.6fs", name, elapsed,
+                             extra={"phase": name, "seconds": elapsed})
+
+    def handled(self, kind, event):
+        self.counters[kind] += 1
+        for hook in self.hooks:
+            hook(kind, event)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("processed %s event at %s, time %s", kind, event.collision, event.time,
+                              extra={"event": kind, "time": event.time,
+                                     "x": event.collision.x, "y": event.collision.y})
+
+    def report(self):
+        summary = {"counters": dict(self.counters), "maxQueue": self.maxQueue, "phases": dict(self.phases)}
+        self.logger.info("skeleton summary %s", summary, extra={"summary": summary})
+        return summary
+
+
+class NullInstrumentation(Instrumentation):
+    # Default when nothing is asked for, every call returns right away
+    def __init__(self):
+        super().__init__()
+        self.enabled = False
+
+    def addHook(self, hook):
+        raise ValueError("hooks need an enabled Instrumentation")
+
+    def count(self, name, amount=1):
+        pass
+
+    def pushed(self, queueSize, amount=1):
+        pass
+
+    def popped(self, valid):
+        pass
+
+    def phase(self, name):
+        return _noPhase
+
+    def handled(self, kind, event):
+        pass
+
+    def report(self):
+        return None
+
+
+_noPhase = nullcontext()
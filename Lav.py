@@ -1,29 +1,83 @@
+import math
 from geometry import *
+from fixedGrid import GridPoint
+import predicates
+
+# Calls of Vertex.bisecting, and how many of them had to compute the ray
+bisectorCounters = {"bisecting": 0, "bisector_evaluations": 0}
 
 class Vertex:
-    def __init__(self, point):
+    __slots__ = ('point', 'next', 'prev', 'lav', 'edgeLeft', 'edgeRight', 'isAlive',
+                 'first', 'processed', 'generation', '_isReflex', 'rayDirection', 'node',
+                 'startTime')
+
+    def __init__(self, point, edgeLeft=None, edgeRight=None):
         self.point = point
         self.next = None
         self.prev = None
         self.lav = None
 
+        # Original polygon edges whose wavefronts meet at this vertex
+        self.edgeLeft = edgeLeft
+        self.edgeRight = edgeRight
+
         self.isAlive = True
         self.first = False
         self.processed = False
+        # Bumped whenever the outgoing LAV edge changes, edge events keep a copy
+        self.generation = 0
 
+        # Cached by bisecting together with _isReflex, None until computed
         self._isReflex = False
         self.rayDirection = None
 
+        # Skeleton node the vertex starts from, None until looked up for the input vertices
+        self.node = None
+
+        # Cached by creationTime, the point and the edges never change once the vertex is linked
+        self.startTime = None
+
 
-    def __eq__(self, value):
-        return self.point == value.point #pode dar problema no futuro
+    def link(self, nextVertex):
+        if self.next is not nextVertex:
+            self.neighbourChanged()
+        if nextVertex.prev is not self:
+            nextVertex.neighbourChanged()
+        self.next = nextVertex
+        nextVertex.prev = self
+        self.generation += 1
 
-    def __hash__(self):
-        return hash(self.point)
+    def neighbourChanged(self):
+        # Only a ray taken from the neighbour points depends on them,
+        # one taken from the original edges never changes
+        if self.edgeLeft is None or self.edgeRight is None:
+            self.rayDirection = None
+
+    def retire(self):
+        self.isAlive = False
+        self.generation += 1
+        self.prev = None
+        self.next = None
+        self.lav = None
 
     def bisecting(self):
+        bisectorCounters["bisecting"] += 1
+        if self.rayDirection is not None:
+            return self.rayDirection
+        bisectorCounters["bisector_evaluations"] += 1
         self.isReflex()
-        if self._isReflex:
+        if self.edgeLeft is not None and self.edgeRight is not None:
+            dirLeft = self.edgeLeft.direction()
+            dirRight = self.edgeRight.direction()
+            if self._isReflex:
+                bicectDir = dirLeft - dirRight
+            else:
+                bicectDir = dirRight - dirLeft
+            if abs(bicectDir.x) < 1e-12 and abs(bicectDir.y) < 1e-12:
+                # Collinear edges: the wavefront moves along the inward normal
+                bicectDir = Point(-dirLeft.y, dirLeft.x)
+
+        elif self._isReflex:
             dirIn = (self.point - self.prev.point).normalize()
             dirOut = (self.point - self.next.point).normalize()
             bicectDir = (dirIn + dirOut).normalize()
@@ -38,62 +92,140 @@ class Vertex:
 
     def isReflex(self):
         # Vetores
-        v_prev = self.point - self.prev.point
-        v_next = self.next.point - self.point
+        if self.edgeLeft is not None and self.edgeRight is not None:
+            a, b = self.edgeLeft.ini, self.edgeLeft.end
+            c, d = self.edgeRight.ini, self.edgeRight.end
+        else:
+            a, b = self.prev.point, self.point
+            c, d = self.point, self.next.point
         
-        # Cross product
-        cross = v_prev.x * v_next.y - v_prev.y * v_next.x
+        # Cross product, exact sign even for nearly collinear edges
+        if type(a) is GridPoint and type(b) is GridPoint and type(c) is GridPoint and type(d) is GridPoint:
+            cross = predicates.orientation_grid(a.ix, a.iy, b.ix, b.iy, c.ix, c.iy, d.ix, d.iy)
+        else:
+            cross = predicates.orientation(a.x, a.y, b.x, b.y, c.x, c.y, d.x, d.y)
         self._isReflex = cross < 0
 
         return cross < 0  # CCW polygon rule
     
+    def turn(self):
+        # Signed angle from the left edge to the right one, the turns around a LAV add up to 2 pi times its winding
+        dirLeft = self.edgeLeft.direction()
+        dirRight = self.edgeRight.direction()
+        cross = dirLeft.cross(dirRight)
+        dot = dirLeft.dot(dirRight)
+        if cross == 0 and dot < 0:
+            # Edges back to back, the tip of a spike of no width
+            return -math.pi if self.isReflex() else math.pi
+        return math.atan2(cross, dot)
+
+    def creationTime(self):
+        # Every wavefront vertex lies at distance t from the lines of its edges
+        if self.edgeLeft is None:
+            return 0
+        if self.startTime is None:
+            self.startTime = self.point.distanceToLine(self.edgeLeft.ini, self.edgeLeft.end)
+        return self.startTime
+
+    def positionAt(self, time):
+        direction = self.rayDirection.direction
+        speed = abs(direction.cross(self.edgeLeft.direction())) if self.edgeLeft is not None else 1
+        if speed == 0:
+            return self.point
+        return self.point + direction * ((time - self.creationTime()) / speed)
+
     def __repr__(self):
         return f"Vertex({self.point}, isReflex={self._isReflex}, isAlive={self.isAlive}, processed={self.processed})"
 
 class Lav:
-    def __init__(self, head:Vertex):
+    def __init__(self, head:Vertex, edgeIndex=None, worklist=None):
         self.head = head
         self.head.first = True
         self.count = 0
+        # Spatial index over the live LAV edges, shared by the whole SLAV
+        self.edgeIndex = edgeIndex
+        # Alive vertices not processed yet, also shared by the whole SLAV
+        self.worklist = worklist
+        # Set of the LAVs that bound the same piece of the shrinking polygon
+        self.region = None
+        # 1 for the counter clockwise LAV around a piece, -1 for the clockwise ones around its holes
+        self.winding = 1
+
+    def track(self, vertex:Vertex):
+        if self.worklist is not None and vertex.isAlive and not vertex.processed:
+            self.worklist[vertex] = None
+
+    def markProcessed(self, vertex:Vertex):
+        vertex.processed = True
+        if self.worklist is not None:
+            self.worklist.pop(vertex, None)
 
     def insert_vertex_between(self, vertexA:Vertex, vertexB:Vertex, newVertex:Vertex):
-        newVertex.prev = vertexA
-        newVertex.next = vertexB
-        vertexA.next = newVertex
-        vertexB.prev = newVertex
+        vertexA.link(newVertex)
+        newVertex.link(vertexB)
         self.count += 1
+        self.track(newVertex)
+        if self.edgeIndex is not None:
+            self.edgeIndex.update(vertexA)
+            self.edgeIndex.update(newVertex)
 
     def remove_vertex(self, vertex:Vertex):
         if vertex is None:
             return
 
-        if self.head == vertex:
+        if self.head is vertex:
             self.head = vertex.next
             self.head.first = True
-        vertex.isAlive = False
-        vertex.prev.next = vertex.next
-        vertex.next.prev = vertex.prev
-        vertex.prev = None
-        vertex.next = None
-        vertex.lav = None 
+        prev = vertex.prev
+        prev.link(vertex.next)
+        vertex.retire()
+        if self.worklist is not None:
+            self.worklist.pop(vertex, None)
+        if self.edgeIndex is not None:
+            self.edgeIndex.remove(vertex)
+            self.edgeIndex.update(prev)
         self.count -= 1
 
     def draw (self, ax, colorE='black',colorP='green'):
-        vertex = self.head
+        from render import draw_lav
+        draw_lav(self, ax, colorE, colorP)
+
+
+    def claim(self, start, stop):
+        # Moves the vertices from start to stop, following next, into this LAV
+        vertex = start
         while True:
-            vertex = vertex.next
-            vertex.point.draw_seg(vertex.next.point, ax, color=colorE)
-            vertex.point.draw(ax, color=colorP)
-            if vertex.first:
+            vertex.lav = self
+            vertex.first = vertex is self.head
+            self.track(vertex)
+            if vertex is stop:
                 break
+            vertex = vertex.next
 
 
 class Slav:
-    def __init__(self):
-        self.lavs = []
+    def __init__(self, edgeIndex=None):
+        # Insertion ordered set of LAVs, adding and removing one is O(1)
+        self.lavs = {}
+        self.edgeIndex = edgeIndex
+        # Insertion ordered set of the vertices still waiting to be processed
+        self.unprocessed = {}
+
+    def __iter__(self):
+        return iter(self.lavs)
+
+    def __len__(self):
+        return len(self.lavs)
+
+    def addLav(self, lav:Lav, region=None):
+        # Without a region the LAV bounds a piece of its own
+        self.lavs[lav] = None
+        if region is None:
+            region = set()
+        region.add(lav)
+        lav.region = region
 
-    def addLav(self, lav:Lav):
-        self.lavs.append(lav)
-        
     def removeLav(self, lav:Lav):
-        self.lavs.remove(lav)
+        self.lavs.pop(lav, None)
+        if lav.region is not None:
+            lav.region.discard(lav)
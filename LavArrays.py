@@ -0,0 +1,188 @@
+import numpy as np
+import predicates
+from fixedGrid import GridPoint
+
+class LavArrays:
+    """
+    Struct of arrays view of the initial LAV. Row i is vertex i, and edge i
+    goes from vertex i to vertex i + 1, so it is the edgeRight of vertex i
+    and the edgeLeft of vertex i + 1. Mirrors Vertex.bisecting and
+    StraightSkeleton.findEdgeEvent for the original polygon vertices.
+    """
+    def __init__(self, points):
+        self.coords = np.array([(p.x, p.y) for p in points], dtype=np.float64)
+        self.n = len(self.coords)
+
+        self.edgeVectors = np.roll(self.coords, -1, axis=0) - self.coords
+        self.edgeLengths = np.sqrt(self.edgeVectors[:, 0] ** 2 + self.edgeVectors[:, 1] ** 2)
+        self.edgeDirections = self._normalize(self.edgeVectors, self.edgeLengths)
+
+        self.reflex = self._reflex(points)
+        self.bisectors = self._bisectors()
+
+    def _normalize(self, vectors, lengths):
+        # Zero vectors stay zero, like Point.normalize
+        safe = np.where(lengths == 0, 1.0, lengths)
+        return np.where((lengths == 0)[:, None], 0.0, vectors / safe[:, None])
+
+    def _reflex(self, points):
+        if self.n and all(type(p) is GridPoint for p in points):
+            # Snapped input, the integer test is exact without any filter
+            return np.array([predicates.orientation_grid(a.ix, a.iy, b.ix, b.iy, b.ix, b.iy, d.ix, d.iy) < 0
+                             for a, b, d in zip(points[-1:] + points[:-1], points, points[1:] + points[:1])],
+                            dtype=bool)
+        previous = np.roll(self.edgeVectors, 1, axis=0)
+        left = previous[:, 0] * self.edgeVectors[:, 1]
+        right = previous[:, 1] * self.edgeVectors[:, 0]
+        cross = left - right
+        # Same filter as predicates.orientation, only the uncertain rows are redone exactly
+        unsure = np.flatnonzero(np.abs(cross) <= predicates.ERROR_BOUND * (np.abs(left) + np.abs(right)))
+        predicates.counters["orientation"] += self.n - len(unsure)
+        a = np.roll(self.coords, 1, axis=0)
+        b = self.coords
+        d = np.roll(self.coords, -1, axis=0)
+        for i in unsure:
+            cross[i] = predicates.orientation(a[i, 0], a[i, 1], b[i, 0], b[i, 1], b[i, 0], b[i, 1], d[i, 0], d[i, 1])
+        return cross < 0
+
+    def _bisectors(self):
+        dirLeft = np.roll(self.edgeDirections, 1, axis=0)
+        dirRight = self.edgeDirections
+        bisectors = np.where(self.reflex[:, None], dirLeft - dirRight, dirRight - dirLeft)
+
+        # Collinear edges: the wavefront moves along the inward normal
+        collinear = (np.abs(bisectors[:, 0]) < 1e-12) & (np.abs(bisectors[:, 1]) < 1e-12)
+        normals = np.stack((-dirLeft[:, 1], dirLeft[:, 0]), axis=1)
+        bisectors = np.where(collinear[:, None], normals, bisectors)
+
+        # Ray normalizes its direction again, so keep the raw vectors for it
+        self.rawBisectors = bisectors
+        lengths = np.sqrt(bisectors[:, 0] ** 2 + bisectors[:, 1] ** 2)
+        return self._normalize(bisectors, lengths)
+
+    def edgeEvents(self, eps=1e-9, sameEps=1e-6):
+        """
+        Edge events between every vertex i and vertex i + 1.
+        Returns (valid, collisions, times) where valid is a boolean mask.
+        """
+        p1 = self.coords
+        b1 = self.bisectors
+        p2 = np.roll(p1, -1, axis=0)
+        b2 = np.roll(b1, -1, axis=0)
+
+        dx = p2[:, 0] - p1[:, 0]
+        dy = p2[:, 1] - p1[:, 1]
+        left = b1[:, 0] * b2[:, 1]
+        right = b1[:, 1] * b2[:, 0]
+        det = left - right
+        # Same filter as predicates.cross
+        unsure = np.flatnonzero(np.abs(det) <= predicates.ERROR_BOUND * (np.abs(left) + np.abs(right)))
+        predicates.counters["cross"] += self.n - len(unsure)
+        for i in unsure:
+            det[i] = predicates.cross(b1[i, 0], b1[i, 1], b2[i, 0], b2[i, 1])
+        parallel = det == 0
+        safe = np.where(parallel, 1.0, det)
+        t1 = (dx * b2[:, 1] - dy * b2[:, 0]) / safe
+        t2 = (dx * b1[:, 1] - dy * b1[:, 0]) / safe
+
+        crossing = ~parallel & (t1 >= -eps) & (t2 >= -eps)
+        collisions = p1 + t1[:, None] * b1
+
+        # Time is the distance from the collision to the line of edge i
+        offset = collisions - p1
+        lengths = np.where(self.edgeLengths == 0, 1.0, self.edgeLengths)
+        times = np.abs(self.edgeVectors[:, 0] * offset[:, 1] - self.edgeVectors[:, 1] * offset[:, 0]) / lengths
+        pointDistance = np.sqrt(offset[:, 0] ** 2 + offset[:, 1] ** 2)
+        times = np.where(self.edgeLengths == 0, pointDistance, times)
+
+        # Parallel bisectors only meet when both vertices already coincide
+        coincident = parallel & (np.abs(dx) < sameEps) & (np.abs(dy) < sameEps)
+        collisions = np.where(coincident[:, None], p2, collisions)
+        times = np.where(coincident, 0.0, times)
+
+        return crossing | coincident, collisions, times
+
+
+    def sweeps(self, valid, times, maxTime, index):
+        """
+        Cells of the EdgeGrid index every LAV edge sweeps from time 0 until
+        one of its ends may die, by the edge events (valid, times) or at
+        maxTime, as StraightSkeleton.sweepKeys finds them one edge at a time
+        before any split is queued. Returns the end time and the keys of
+        every vertex i, with the corners at vertex i, vertex i + 1 and both
+        of them again at that time.
+        """
+        times = np.where(valid, times, np.inf)
+        until = np.minimum(np.minimum(np.roll(times, 1), times), np.minimum(np.roll(times, -1), maxTime))
+        until = np.maximum(until, 0.0)
+
+        dirLeft = np.roll(self.edgeDirections, 1, axis=0)
+        speeds = np.abs(self.bisectors[:, 0] * dirLeft[:, 1] - self.bisectors[:, 1] * dirLeft[:, 0])
+        # Like Vertex.positionAt, a vertex that does not move stays where it is
+        safe = np.where(speeds == 0, 1.0, speeds)
+        step = np.where(speeds == 0, 0.0, until / safe)
+        stepRight = np.where(np.roll(speeds, -1) == 0, 0.0, until / np.roll(safe, -1))
+        right = np.roll(self.coords, -1, axis=0)
+        far = self.coords + self.bisectors * step[:, None]
+        farRight = right + np.roll(self.bisectors, -1, axis=0) * stepRight[:, None]
+        xs = np.stack((self.coords[:, 0], right[:, 0], farRight[:, 0], far[:, 0]), axis=1)
+        ys = np.stack((self.coords[:, 1], right[:, 1], farRight[:, 1], far[:, 1]), axis=1)
+
+        # Level with the least cost, the first of equal ones like EdgeGrid.sweepKeys
+        nextXs, nextYs = np.roll(xs, -1, axis=1), np.roll(ys, -1, axis=1)
+        areas = np.abs((xs * nextYs - ys * nextXs).sum(axis=1)) / 2
+        perimeters = np.sqrt((nextXs - xs) ** 2 + (nextYs - ys) ** 2).sum(axis=1)
+        cellCosts = index.cellCosts()
+        sizes = index.cellSize * 2.0 ** np.arange(len(cellCosts))
+        costs = (areas[:, None] / sizes ** 2 + perimeters[:, None] / sizes + 1) * np.asarray(cellCosts)
+        levels = costs.argmin(axis=1)
+        owners, columns, lows, highs = self._polygonCells(xs, ys, sizes[levels], index)
+
+        levels = levels.tolist()
+        keys = [[] for _ in range(self.n)]
+        for owner, i, first, last in zip(owners.tolist(), columns.tolist(), lows.tolist(), highs.tolist()):
+            level = levels[owner]
+            keys[owner].extend((level, i, j) for j in range(first, last + 1))
+        return until.tolist(), keys
+
+    def _polygonCells(self, xs, ys, sizes, index):
+        # EdgeGrid._polygonCells of every row of corners at once, as the rows of
+        # (owner, column, first, last) of the cells of each column, in order
+        minX, minY = index.minX, index.minY
+        x0, x1 = np.maximum(minX, xs.min(axis=1)), np.minimum(index.maxX, xs.max(axis=1))
+        y0, y1 = np.maximum(minY, ys.min(axis=1)), np.minimum(index.maxY, ys.max(axis=1))
+        inside = (x0 <= x1) & (y0 <= y1)
+        i0 = np.floor_divide(x0 - minX, sizes).astype(np.int64)
+        i1 = np.floor_divide(x1 - minX, sizes).astype(np.int64)
+        counts = np.where(inside, i1 - i0 + 1, 0)
+        owners = np.repeat(np.arange(len(xs)), counts)
+        starts = np.cumsum(counts) - counts
+        columns = i0[owners] + np.arange(len(owners)) - starts[owners]
+        size = sizes[owners]
+
+        xa = np.maximum(minX + columns * size, x0[owners])
+        xb = np.minimum(minX + (columns + 1) * size, x1[owners])
+        low = np.full(len(owners), np.inf)
+        high = np.full(len(owners), -np.inf)
+        for k in range(4):
+            ax, ay = xs[owners, k], ys[owners, k]
+            bx, by = xs[owners, (k + 1) % 4], ys[owners, (k + 1) % 4]
+            vertical = ax == bx
+            across = vertical & (xa <= ax) & (ax <= xb)
+            low = np.where(across, np.minimum(low, np.minimum(ay, by)), low)
+            high = np.where(across, np.maximum(high, np.maximum(ay, by)), high)
+            width = np.where(vertical, 1.0, bx - ax)
+            ta, tb = (xa - ax) / width, (xb - ax) / width
+            ta, tb = np.maximum(np.minimum(ta, tb), 0.0), np.minimum(np.maximum(ta, tb), 1.0)
+            hit = ~vertical & (ta <= tb)
+            ya, yb = ay + (by - ay) * ta, ay + (by - ay) * tb
+            low = np.where(hit, np.minimum(low, np.minimum(ya, yb)), low)
+            high = np.where(hit, np.maximum(high, np.maximum(ya, yb)), high)
+        # A single column takes the whole height of the polygon
+        single = (counts == 1)[owners]
+        low = np.where(single, y0[owners], np.maximum(low, y0[owners]))
+        high = np.where(single, y1[owners], np.minimum(high, y1[owners]))
+        keep = low <= high
+        first = np.floor_divide(low[keep] - minY, size[keep]).astype(np.int64)
+        last = np.floor_divide(high[keep] - minY, size[keep]).astype(np.int64)
+        return owners[keep], columns[keep], first, last
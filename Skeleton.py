@@ -1,5 +1,6 @@
+from array import array
 from geometry import *
-import matplotlib.pyplot as plt
+import math
 
 class graph:
     def __init__(self):
@@ -13,7 +14,158 @@ class graph:
         self.edges.add(edge)
 
     def draw(self, ax, colorP='blue',colorE='red'):
-        for edge in self.edges:
-            edge.draw(ax, color=colorP)
-        for vertex in self.vertices:
-            vertex.draw(ax, color=colorE)
\ No newline at end of file
+        from render import draw_graph
+        draw_graph(self, ax, colorP, colorE)
+
+
+class SkeletonArrays:
+    """
+    Skeleton as arrays: vertices (n, 2), edges (m, 2) of vertex indices and
+    the event time of every vertex. They are kept in flat array('d') and
+    array('q') buffers, x and y interleaved and the ends of every arc
+    with the smaller index first. An arc added twice is kept once, the
+    copies are dropped the next time the arrays are read. Points closer
+    than eps are snapped to the same vertex through a hash grid with cells
+    of size eps, which only holds the vertices added with snap=True.
+    """
+    def __init__(self, eps=1e-6):
+        self.eps = eps
+        self.coords = array('d')
+        self.nodeTimes = array('d')
+        self.arcEnds = array('q')
+        self.grid = {}
+        # Number of leading arcs known to be distinct, and the NumPy copies until the next change
+        self.distinct = 0
+        self.cached = {}
+
+    def _key(self, x, y):
+        return (math.floor(x / self.eps), math.floor(y / self.eps))
+
+    def find(self, point:Point):
+        # Index of a vertex within eps of point, or None
+        ci, cj = self._key(point.x, point.y)
+        coords = self.coords
+        for i in (ci - 1, ci, ci + 1):
+            for j in (cj - 1, cj, cj + 1):
+                for index in self.grid.get((i, j), ()):
+                    if abs(coords[2 * index] - point.x) < self.eps and abs(coords[2 * index + 1] - point.y) < self.eps:
+                        return index
+        return None
+
+    def add_vertice(self, vertice:Point, time=float('nan'), snap=True):
+        index = self.find(vertice) if snap else None
+        if index is not None:
+            if math.isnan(self.nodeTimes[index]):
+                self.nodeTimes[index] = time
+                self.cached.pop('times', None)
+            return index
+        index = len(self.nodeTimes)
+        self.coords.append(vertice.x)
+        self.coords.append(vertice.y)
+        self.nodeTimes.append(time)
+        if snap:
+            self.grid.setdefault(self._key(vertice.x, vertice.y), []).append(index)
+        self.cached.clear()
+        return index
+
+    def add_arc(self, a, b):
+        if a != b:
+            self.arcEnds.append(min(a, b))
+            self.arcEnds.append(max(a, b))
+            self.cached.pop('edges', None)
+
+    def add_edge(self, edge:Edge):
+        self.add_arc(self.add_vertice(edge.ini), self.add_vertice(edge.end))
+
+    def _dropRepeatedArcs(self):
+        # Keeps the first copy of every arc, in the order they were added
+        if self.distinct * 2 == len(self.arcEnds):
+            return
+        import numpy as np
+        ends = np.frombuffer(self.arcEnds, dtype=np.int64).reshape(-1, 2)
+        _, first = np.unique(ends, axis=0, return_index=True)
+        kept = np.ascontiguousarray(ends[np.sort(first)])
+        self.arcEnds = array('q', kept.tobytes())
+        self.distinct = len(kept)
+
+    def _copy(self, name, buffer, dtype, width):
+        # NumPy copy of a buffer, kept until the buffer changes
+        if name not in self.cached:
+            import numpy as np
+            copy = np.frombuffer(buffer, dtype=dtype).copy()
+            self.cached[name] = copy.reshape(-1, width) if width > 1 else copy
+        return self.cached[name]
+
+    @property
+    def vertices(self):
+        return self._copy('vertices', self.coords, 'float64', 2)
+
+    @property
+    def edges(self):
+        self._dropRepeatedArcs()
+        return self._copy('edges', self.arcEnds, 'int64', 2)
+
+    @property
+    def times(self):
+        return self._copy('times', self.nodeTimes, 'float64', 1)
+
+    @property
+    def xs(self):
+        return self.coords[0::2]
+
+    @property
+    def ys(self):
+        return self.coords[1::2]
+
+    @property
+    def arcs(self):
+        # Distinct arcs as (a, b) pairs
+        self._dropRepeatedArcs()
+        ends = self.arcEnds
+        return list(zip(ends[0::2], ends[1::2]))
+
+    def fromArrays(vertices, edges, times, eps=1e-6):
+        # Inverse of vertices, edges and times. The vertices do not snap, only the ones added later may
+        import numpy as np
+        result = SkeletonArrays(eps)
+        result.coords = array('d', np.ascontiguousarray(vertices, dtype=np.float64).tobytes())
+        result.nodeTimes = array('d', np.ascontiguousarray(times, dtype=np.float64).tobytes())
+        edges = np.sort(np.asarray(edges, dtype=np.int64).reshape(-1, 2), axis=1)
+        result.arcEnds = array('q', np.ascontiguousarray(edges).tobytes())
+        return result
+
+    def toGraph(self):
+        # Same result as the set based graph, for the older callers
+        result = graph()
+        points = [Point(x, y) for x, y in zip(self.xs, self.ys)]
+        for point in points:
+            result.add_vertice(point)
+        for a, b in self.arcs:
+            result.add_edge(Edge(points[a], points[b]))
+        return result
+
+    def draw(self, ax, colorP='blue', colorE='red'):
+        from render import draw_skeleton_arrays
+        draw_skeleton_arrays(self, ax, colorP, colorE)
+
+
+class ArcStream:
+    """
+    Stand-in for SkeletonArrays that keeps nothing. add_vertice returns the
+    node itself as (x, y, time) and add_arc queues the arc until drain().
+    Nodes are not snapped, so an arc may come out more than once.
+    """
+    def __init__(self):
+        self.pending = []
+
+    def add_vertice(self, vertice:Point, time=float('nan'), snap=True):
+        return (vertice.x, vertice.y, time)
+
+    def add_arc(self, a, b):
+        if a[:2] != b[:2]:
+            self.pending.append((a, b))
+
+    def drain(self):
+        arcs = self.pending
+        self.pending = []
+        return arcs
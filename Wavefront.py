@@ -0,0 +1,163 @@
+from geometry import *
+from collections import deque
+
+class IntervalIndex:
+    """
+    Static centered interval tree over half open intervals [start, end).
+    stab(x) returns the ids of the k intervals holding x in O(log n + k).
+    """
+    def __init__(self, starts, ends):
+        self.starts = starts
+        self.ends = ends
+        self.root = self._build(list(range(len(starts))))
+
+    def _build(self, items):
+        if not items:
+            return None
+        # Median endpoint, each side gets at most half of the intervals
+        endpoints = sorted([self.starts[i] for i in items] + [self.ends[i] for i in items])
+        center = endpoints[(len(endpoints) - 1) // 2]
+        left, here, right = [], [], []
+        for i in items:
+            if self.ends[i] <= center:
+                left.append(i)
+            elif self.starts[i] > center:
+                right.append(i)
+            else:
+                here.append(i)
+        if not here and not (left and right):
+            # Only empty intervals, all on one side, they stay in a leaf
+            here, left, right = items, [], []
+        return (center,
+                sorted(here, key=lambda i: self.starts[i]),
+                sorted(here, key=lambda i: -self.ends[i]),
+                self._build(left), self._build(right))
+
+    def stab(self, x):
+        found = []
+        node = self.root
+        while node is not None:
+            center, byStart, byEnd, left, right = node
+            if x < center:
+                # Every interval here ends after center, only the start matters
+                for i in byStart:
+                    if self.starts[i] > x:
+                        break
+                    if x < self.ends[i]:
+                        found.append(i)
+                node = left
+            else:
+                # Every interval here starts before center, only the end matters
+                for i in byEnd:
+                    if self.ends[i] <= x:
+                        break
+                    if self.starts[i] <= x:
+                        found.append(i)
+                node = right
+        return found
+
+
+class WavefrontTimeline:
+    """
+    Every wavefront vertex of a skeleton run, alive on [birth, death) and
+    moving on a straight line between its two original edges. The offset
+    polygon at distance d is made of the vertices alive at d: on each
+    original edge the wavefront segments are disjoint, so ordering their
+    vertices along the edge pairs every segment start with its end.
+    """
+    def __init__(self):
+        self.births = []
+        self.deaths = []
+        self.origins = []
+        self.velocities = []
+        self.edgesLeft = []
+        self.edgesRight = []
+        self.index = None
+
+    def __len__(self):
+        return len(self.births)
+
+    def add(self, vertex, death):
+        birth = vertex.creationTime()
+        velocity = Point(0.0, 0.0)
+        if vertex.rayDirection is not None and vertex.edgeLeft is not None:
+            direction = vertex.rayDirection.direction
+            speed = abs(direction.cross(vertex.edgeLeft.direction()))
+            if speed != 0:
+                velocity = direction * (1 / speed)
+        self.births.append(birth)
+        self.deaths.append(max(death, birth))
+        self.origins.append(vertex.point)
+        self.velocities.append(velocity)
+        self.edgesLeft.append(vertex.edgeLeft)
+        self.edgesRight.append(vertex.edgeRight)
+        self.index = None
+
+    def alive(self, distance):
+        if self.index is None:
+            self.index = IntervalIndex(self.births, self.deaths)
+        return self.index.stab(distance)
+
+    def position(self, i, distance):
+        return self.origins[i] + self.velocities[i] * (distance - self.births[i])
+
+    def rings(self, alive, distance):
+        # Closed offset rings through the alive vertices, broken chains are left out
+        positions = {i: self.position(i, distance) for i in alive}
+        along = {}
+        for i in alive:
+            # (projection on the edge, is start, vertex), ends sort before starts
+            for edge, start in ((self.edgesRight[i], True), (self.edgesLeft[i], False)):
+                if edge is not None:
+                    key = positions[i].dot(edge.end - edge.ini)
+                    along.setdefault(id(edge), []).append((key, start, i))
+        following = {}
+        for items in along.values():
+            items.sort(key=lambda item: (item[0], item[1]))
+            pending = deque()
+            for _, start, i in items:
+                if start:
+                    pending.append(i)
+                elif pending:
+                    following[pending.popleft()] = i
+
+        rings = []
+        visited = set()
+        for first in following:
+            if first in visited:
+                continue
+            ring = []
+            vertex = first
+            while vertex in following and vertex not in visited:
+                visited.add(vertex)
+                ring.append(vertex)
+                vertex = following[vertex]
+            if vertex == first and len(ring) > 2:
+                rings.append([positions[i] for i in ring])
+        return rings
+
+    def offset(self, distance):
+        # Rings of the wavefront at distance, as lists of Points
+        return self.rings(self.alive(distance), distance)
+
+    def offsets(self, distances):
+        """
+        Rings at every distance of the list, in the given order. One sweep
+        over the births and deaths serves all of them.
+        """
+        order = sorted(range(len(distances)), key=lambda j: distances[j])
+        byBirth = sorted(range(len(self.births)), key=lambda i: self.births[i])
+        byDeath = sorted(range(len(self.deaths)), key=lambda i: self.deaths[i])
+        active = {}
+        b = d = 0
+        results = [None] * len(distances)
+        for j in order:
+            distance = distances[j]
+            while b < len(byBirth) and self.births[byBirth[b]] <= distance:
+                active[byBirth[b]] = None
+                b += 1
+            while d < len(byDeath) and self.deaths[byDeath[d]] <= distance:
+                active.pop(byDeath[d], None)
+                d += 1
+            results[j] = self.rings(active, distance)
+        return results
@@ -0,0 +1,188 @@
+import argparse
+import collections
+import contextlib
+import itertools
+import json
+import math
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from straightSkeleton import *
+from polygonStore import *
+from resultCache import *
+
+class PolygonTimeout(Exception):
+    pass
+
+def read_polygons(filepath):
+    """
+    Yields (name, points, holes) from a polygons.json style dict, from a
+    JSONL file with one {"name", "points", "holes"} object per line or
+    from a PolygonStore directory.
+    """
+    if os.path.isdir(filepath):
+        store = PolygonStore(filepath)
+        for name in store.names:
+            outline, holes = store.arrays(name)
+            yield name, outline.tolist(), [hole.tolist() for hole in holes]
+    elif filepath.endswith('.jsonl'):
+        with open(filepath, 'r') as f:
+            for number, line in enumerate(f):
+                line = line.strip()
+                if not line:
+                    continue
+                info = json.loads(line)
+                yield info.get("name", str(number)), info["points"], info.get("holes", [])
+    else:
+        with open(filepath, 'r') as f:
+            data = json.load(f)
+        for name, info in data.items():
+            yield name, info["points"], info.get("holes", [])
+
+def check_rings(points, holes):
+    # Raises ValueError for a ring the skeleton cannot start from
+    for ring in [points] + list(holes):
+        if len({(float(p[0]), float(p[1])) for p in ring}) < 3:
+            raise ValueError(f"a ring needs at least 3 distinct vertices, got {len(ring)} points")
+
+def _raise_timeout(signum, frame):
+    raise PolygonTimeout()
+
+@contextlib.contextmanager
+def time_limit(seconds):
+    # Raises PolygonTimeout in the block once seconds have passed, where there is a SIGALRM
+    useAlarm = seconds and hasattr(signal, 'SIGALRM')
+    if useAlarm:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        if useAlarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+# One ResultCache per cache directory in each worker process
+_caches = {}
+
+def _cache(path):
+    if path not in _caches:
+        _caches[path] = ResultCache(path)
+    return _caches[path]
+
+def skeleton_job(job):
+    # Runs in a worker process, every failure becomes an error record
+    name, points, holes, timeout, cachePath = job
+    start = time.perf_counter()
+    try:
+        check_rings(points, holes)
+        with time_limit(timeout):
+            outline = [Point(p[0], p[1]) for p in points]
+            rings = [[Point(p[0], p[1]) for p in hole] for hole in holes]
+            cached = False
+            if cachePath:
+                cache = _cache(cachePath)
+                hits = cache.stats["hits"]
+                result = cache.skeleton(outline, rings)
+                cached = cache.stats["hits"] > hits
+            else:
+                skeleton = StraightSkeleton(outline, rings)
+                skeleton.run()
+                result = skeleton.skeletonResult
+        return {
+            "name": name,
+            "status": "ok",
+            "seconds": time.perf_counter() - start,
+            "cached": cached,
+            "vertices": result.vertices.tolist(),
+            "edges": result.edges.tolist(),
+            "times": [None if math.isnan(t) else t for t in result.nodeTimes],
+        }
+    except PolygonTimeout:
+        return {"name": name, "status": "timeout", "seconds": time.perf_counter() - start}
+    except Exception as error:
+        return {"name": name, "status": "error", "seconds": time.perf_counter() - start,
+                "error": f"{type(error).__name__}: {error}"}
+
+def skeleton_chunk(jobs):
+    # A few jobs per round trip to the worker, like the chunksize of map
+    return [skeleton_job(job) for job in jobs]
+
+def _crashed(chunk, error, seconds):
+    return [{"name": job[0], "status": "error", "seconds": seconds, "error": f"{type(error).__name__}: {error}"}
+            for job in chunk]
+
+def run_batch(filepath, out, workers=None, chunksize=8, timeout=None, cachePath=None, window=None):
+    """
+    Streams one JSON line per polygon to out, in input order.
+    At most window chunks of chunksize polygons are read ahead of the
+    output, two per worker by default, so a large library is never held
+    in memory at once. Returns the number of polygons that did not
+    finish with status ok.
+    A worker that dies takes the chunks not yet done with it, those are
+    written as errors and the rest of the batch goes on in a new pool.
+    """
+    jobs = ((name, points, holes, timeout, cachePath) for name, points, holes in read_polygons(filepath))
+    failures = 0
+    if window is None:
+        window = 2 * (workers or os.cpu_count() or 1)
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = collections.deque()
+        while True:
+            while len(pending) < window:
+                chunk = list(itertools.islice(jobs, chunksize))
+                if not chunk:
+                    break
+                try:
+                    future = executor.submit(skeleton_chunk, chunk)
+                except BrokenProcessPool:
+                    # A worker died before its chunk came up here
+                    executor.shutdown(wait=False)
+                    executor = ProcessPoolExecutor(max_workers=workers)
+                    future = executor.submit(skeleton_chunk, chunk)
+                pending.append((chunk, executor, time.perf_counter(), future))
+            if not pending:
+                break
+            # The oldest chunk is written as soon as it is done, the others keep running
+            chunk, owner, start, future = pending.popleft()
+            try:
+                results = future.result()
+            except BrokenProcessPool as error:
+                results = _crashed(chunk, error, time.perf_counter() - start)
+                if owner is executor:
+                    executor.shutdown(wait=False)
+                    executor = ProcessPoolExecutor(max_workers=workers)
+            for result in results:
+                if result["status"] != "ok":
+                    failures += 1
+                out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        executor.shutdown()
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Straight skeletons of every polygon in a file, as JSONL")
+    parser.add_argument("polygons", help="polygons.json style file, .jsonl file or PolygonStore directory")
+    parser.add_argument("-o", "--output", help="output JSONL file, stdout by default")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("-c", "--chunksize", type=int, default=8, help="polygons sent to a worker at a time")
+    parser.add_argument("-t", "--timeout", type=float, default=None, help="seconds allowed per polygon")
+    parser.add_argument("--cache", default=None, help="ResultCache directory shared by the workers")
+    parser.add_argument("--window", type=int, default=None, help="chunks read ahead of the output, 2 per worker by default")
+    args = parser.parse_args(argv)
+
+    if args.output:
+        with open(args.output, 'w') as out:
+            failures = run_batch(args.polygons, out, args.workers, args.chunksize, args.timeout, args.cache,
+                                 args.window)
+    else:
+        failures = run_batch(args.polygons, sys.stdout, args.workers, args.chunksize, args.timeout,
+                             args.cache, args.window)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+from straightSkeleton import *
+from foldAndCut import power_diagram_vertices, validate_power_vertices
+from polygonGenerators import *
+
+# Every generator returns (outline, holes) for n vertices and a seed
+GENERATORS = {
+    "star": lambda n, seed: (random_star(n, seed), []),
+    "comb": lambda n, seed: (comb_polygon(n, seed), []),
+    "regular": lambda n, seed: (regular_polygon(n, seed), []),
+    "holes": holes_polygon,
+}
+
+def ring_circles(rings):
+    # One circle per vertex, clear of both neighbours
+    circles = []
+    for ring in rings:
+        n = len(ring)
+        for i in range(n):
+            before = math.hypot(ring[i].x - ring[i - 1].x, ring[i].y - ring[i - 1].y)
+            after = math.hypot(ring[(i + 1) % n].x - ring[i].x, ring[(i + 1) % n].y - ring[i].y)
+            circles.append(Disc(ring[i], 0.4 * min(before, after)))
+    return circles
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+def bench_polygon(points, holes):
+    # Seconds of every stage for one polygon, and the bisectors computed by the skeleton
+    seconds = {}
+    evaluations = bisectorCounters["bisector_evaluations"]
+    seconds["init"], skeleton = timed(lambda: StraightSkeleton(points, holes))
+    seconds["run"], _ = timed(skeleton.run)
+    bisectors = bisectorCounters["bisector_evaluations"] - evaluations
+
+    circles = ring_circles([points] + holes)
+    seconds["power_diagram"], vertices = timed(lambda: power_diagram_vertices(circles))
+    xs = [p.x for p in points]
+    ys = [p.y for p in points]
+    box = [Point(min(xs), min(ys)), Point(max(xs), max(ys))]
+    seconds["validation"], _ = timed(lambda: validate_power_vertices(vertices, circles, box))
+    return seconds, bisectors
+
+def scaling_exponent(sizes, seconds):
+    # Least squares slope of log(seconds) against log(n)
+    pairs = [(math.log(n), math.log(t)) for n, t in zip(sizes, seconds) if t is not None and t > 0]
+    if len(pairs) < 2:
+        return None
+    mx = sum(x for x, _ in pairs) / len(pairs)
+    my = sum(y for _, y in pairs) / len(pairs)
+    sxx = sum((x - mx) ** 2 for x, _ in pairs)
+    if sxx == 0:
+        return None
+    return sum((x - mx) * (y - my) for x, y in pairs) / sxx
+
+def run_benchmarks(generators, sizes, seed=0, budget=60.0):
+    """
+    results[generator][stage][n] = seconds. Once a generator gets slow, a
+    size is skipped if the last one scaled linearly would exceed budget.
+    """
+    results = {}
+    for name in generators:
+        results[name] = {}
+        last = None
+        for n in sizes:
+            if last is not None and last[1] * n / last[0] > budget:
+                print(f"{name:8} n={n:<7} skipped")
+                continue
+            points, holes = GENERATORS[name](n, seed)
+            seconds, bisectors = bench_polygon(points, holes)
+            for stage, value in seconds.items():
+                results[name].setdefault(stage, {})[n] = value
+            last = (n, sum(seconds.values()))
+            print(f"{name:8} n={n:<7} " + " ".join(f"{stage}={value:.4f}" for stage, value in seconds.items())
+                  + f" bisectors={bisectors}")
+    return results
+
+def exponents(results):
+    table = {}
+    for name, stages in results.items():
+        table[name] = {}
+        for stage, timings in stages.items():
+            sizes = sorted(timings)
+            table[name][stage] = scaling_exponent(sizes, [timings[n] for n in sizes])
+    return table
+
+def compare(results, baseline, threshold=1.5, minSeconds=0.01):
+    # Stages at least threshold times slower than the baseline, too short timings are noise
+    regressions = []
+    for name, stages in results.items():
+        for stage, timings in stages.items():
+            old = baseline.get("results", {}).get(name, {}).get(stage, {})
+            for n, value in timings.items():
+                before = old.get(str(n))
+                if before and before >= minSeconds and value / before >= threshold:
+                    regressions.append((name, stage, n, before, value))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Timings of the skeleton and power diagram stages")
+    parser.add_argument("--generators", default=",".join(GENERATORS), help="comma separated generator names")
+    parser.add_argument("--sizes", default="10,100,1000,10000,100000", help="comma separated vertex counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--budget", type=float, default=60.0, help="seconds allowed per polygon")
+    parser.add_argument("--save", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", help="JSON baseline to compare against")
+    parser.add_argument("--threshold", type=float, default=1.5, help="slowdown reported as a regression")
+    parser.add_argument("--min-seconds", type=float, default=0.01, help="baseline timings below this are not compared")
+    args = parser.parse_args(argv)
+
+    sizes = [int(n) for n in args.sizes.split(",")]
+    results = run_benchmarks(args.generators.split(","), sizes, args.seed, args.budget)
+
+    table = exponents(results)
+    print("scaling exponents")
+    for name, stages in table.items():
+        print(f"{name:8} " + " ".join(f"{stage}={'-' if k is None else f'{k:.2f}'}" for stage, k in stages.items()))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({"python": platform.python_version(), "seed": args.seed,
+                       "results": results, "exponents": table}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_seconds)
+        for name, stage, n, before, value in regressions:
+            print(f"regression {name} {stage} n={n}: {before:.4f}s -> {value:.4f}s")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import math
+from geometry import *
+
+class GridPoint(Point):
+    # Input point snapped to a FixedGrid, (ix, iy) are its grid coordinates
+    __slots__ = ('ix', 'iy')
+
+    def __init__(self, ix, iy, quantum):
+        super().__init__(ix * quantum, iy * quantum)
+        self.ix = ix
+        self.iy = iy
+
+    def __repr__(self):
+        return f"GridPoint({self.x}, {self.y})"
+
+
+class FixedGrid:
+    """
+    Integer grid for inputs that are already on one, like CAD drawings.
+    Snapped points keep their integer coordinates, so orientation tests on
+    the original edges are exact integer arithmetic. Event times and
+    collision points, which are not on the grid, are compared as integer
+    multiples of resolution: the event queue orders integer ticks and
+    collisions are clustered by integer cells of eps, looked up in a hash
+    instead of scanned.
+    The grid coordinates must fit an int64.
+    """
+    def __init__(self, quantum=2.0 ** -20, eps=1e-6, resolution=None):
+        self.quantum = quantum
+        self.resolution = resolution if resolution is not None else eps / 1024
+        # Times and collision points closer than cell units are the same
+        self.cell = max(1, math.ceil(eps / self.resolution))
+
+    def index(self, point):
+        ix = round(point.x / self.quantum)
+        iy = round(point.y / self.quantum)
+        if max(abs(ix), abs(iy)) >= 2 ** 63:
+            raise ValueError("coordinates too large for the grid quantum")
+        return ix, iy
+
+    def snap(self, points):
+        # Ring of GridPoints, vertices that snap onto the previous one are dropped
+        snapped = []
+        for point in points:
+            ix, iy = self.index(point)
+            if not snapped or (ix, iy) != (snapped[-1].ix, snapped[-1].iy):
+                snapped.append(GridPoint(ix, iy, self.quantum))
+        while len(snapped) > 1 and (snapped[0].ix, snapped[0].iy) == (snapped[-1].ix, snapped[-1].iy):
+            snapped.pop()
+        return snapped
+
+    def ticks(self, time):
+        return round(time / self.resolution)
+
+    def span(self, length):
+        # Ticks covering a length of time
+        return max(1, math.ceil(length / self.resolution))
+
+    def cluster(self, events):
+        """
+        Same grouping as StraightSkeleton.cluster_by_collision: an event
+        joins the first group whose first collision is within the cell.
+        Groups are found through a hash of the cells around the point
+        instead of a scan over every group.
+        """
+        clusters = []
+        firsts = []
+        cells = {}
+        for event in events:
+            ix, iy = round(event.collision.x / self.resolution), round(event.collision.y / self.resolution)
+            cx, cy = ix // self.cell, iy // self.cell
+            found = None
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for k in cells.get((cx + dx, cy + dy), ()):
+                        jx, jy = firsts[k]
+                        if abs(ix - jx) < self.cell and abs(iy - jy) < self.cell and (found is None or k < found):
+                            found = k
+            if found is None:
+                cells.setdefault((cx, cy), []).append(len(clusters))
+                firsts.append((ix, iy))
+                clusters.append([event])
+            else:
+                clusters[found].append(event)
+        return clusters
@@ -1,45 +1,41 @@
-import matplotlib.pyplot as plt
 from geometry import *
-from scipy.spatial import Delaunay
+from scipy.spatial import Delaunay, ConvexHull, QhullError, cKDTree
 import numpy as np
 import math
 
-def voronoi_vertices_from_delaunay(points):
+def voronoi_vertices_from_delaunay(points, asPoints=False, eps=1e-12):
    """
     points: lista de pontos (x,y)
-    return: lista de (vx, vy, simplex_indices)
+    return: (centers, simplices), arrays (m, 2) e (m, 3)
+            com asPoints=True, lista de (Point, simplex_indices)
    """
-   aux = [(p.x, p.y) for p in points]
-
-   pts = np.array(aux)
+   pts = np.array([(p.x, p.y) for p in points], dtype=np.float64)
    tri = Delaunay(pts)
 
-   vertices = []
-   for simplex in tri.simplices:
-      (i, j, k) = simplex
-      A = pts[i]
-      B = pts[j]
-      C = pts[k]
-
-      # circuncentro do triângulo ABC
-      d = 2 * (A[0]*(B[1]-C[1]) +
-              B[0]*(C[1]-A[1]) +
-              C[0]*(A[1]-B[1]))
+   # circuncentros de todos os triângulos de uma vez, (m, 3, 2)
+   corners = pts[tri.simplices]
+   A, B, C = corners[:, 0], corners[:, 1], corners[:, 2]
 
-      if abs(d) < 1e-12:
-         continue
+   d = 2 * (A[:, 0]*(B[:, 1]-C[:, 1]) +
+            B[:, 0]*(C[:, 1]-A[:, 1]) +
+            C[:, 0]*(A[:, 1]-B[:, 1]))
 
-      ux = ((np.linalg.norm(A)**2)*(B[1]-C[1]) +
-           (np.linalg.norm(B)**2)*(C[1]-A[1]) +
-           (np.linalg.norm(C)**2)*(A[1]-B[1])) / d
+   valid = np.abs(d) >= eps
+   A, B, C, d = A[valid], B[valid], C[valid], d[valid]
+   simplices = tri.simplices[valid]
 
-      uy = ((np.linalg.norm(A)**2)*(C[0]-B[0]) +
-           (np.linalg.norm(B)**2)*(A[0]-C[0]) +
-           (np.linalg.norm(C)**2)*(B[0]-A[0])) / d
+   a2 = (A**2).sum(axis=1)
+   b2 = (B**2).sum(axis=1)
+   c2 = (C**2).sum(axis=1)
 
-      vertices.append((Point(ux,uy), (i, j, k)))
+   ux = (a2*(B[:, 1]-C[:, 1]) + b2*(C[:, 1]-A[:, 1]) + c2*(A[:, 1]-B[:, 1])) / d
+   uy = (a2*(C[:, 0]-B[:, 0]) + b2*(A[:, 0]-C[:, 0]) + c2*(B[:, 0]-A[:, 0])) / d
+   centers = np.column_stack((ux, uy))
 
-   return vertices
+   if asPoints:
+      return [(Point(float(x), float(y)), (int(i), int(j), int(k)))
+              for (x, y), (i, j, k) in zip(centers, simplices)]
+   return centers, simplices
 
 def weighted_voronoi_vertex(c1, c2, c3):
     """
@@ -66,22 +62,128 @@ def weighted_voronoi_vertex(c1, c2, c3):
     p = np.linalg.solve(A, b)
     return (Point(p[0], p[1]))
 
-def power_diagram_vertices(circles):
+def power_diagram_vertices(circles, eps=1e-12):
     """
-    Gera todos os vértices ponderados possíveis combinando trios de círculos.
+    Vértices do diagrama de potência, via triangulação regular.
+    Cada círculo vira o ponto (x, y, x^2 + y^2 - r^2) e cada face do fecho
+    convexo inferior corresponde a um vértice do diagrama.
+    return: lista de (Point, (i, j, k))
     """
-    vertices = []
-    n = len(circles)
-    for i in range(n):
-        for j in range(i+1, n):
-            for k in range(j+1, n):
-                v = weighted_voronoi_vertex(circles[i], circles[j], circles[k])
-                if v is not None:
-                    vertices.append((v, (i,j,k)))
-
-    return vertices
+    if len(circles) < 3:
+        return []
+    if len(circles) == 3:
+        # Qhull needs four points for a hull in 3D
+        v = weighted_voronoi_vertex(*circles)
+        return [] if v is None else [(v, (0, 1, 2))]
+
+    sites = np.array([(c.center.x, c.center.y) for c in circles], dtype=np.float64)
+    radii = np.array([c.radius for c in circles], dtype=np.float64)
+    lifted = np.column_stack((sites, (sites ** 2).sum(axis=1) - radii ** 2))
+
+    try:
+        hull = ConvexHull(lifted)
+        joggled = False
+    except QhullError:
+        # Coplanar lifted points, like equal circles centred on one circle,
+        # the joggled input gives a triangulation of the plane
+        hull = ConvexHull(lifted, qhull_options='QJ')
+        joggled = True
+
+    # Plane of a lower face: z = 2 v.p + c, where v is the power vertex
+    normals = hull.equations[:, :3]
+    lower = normals[:, 2] < -eps
+    centers = -normals[lower, :2] / (2 * normals[lower, 2:3])
+    triples = np.sort(hull.simplices[lower], axis=1)
+
+    if joggled:
+        # Planes of the joggled points are a little off, solve each triple
+        # on the exact lifted points like weighted_voronoi_vertex
+        i, j, k = triples.T
+        a = 2 * (sites[j] - sites[i])
+        b = 2 * (sites[k] - sites[i])
+        zj = lifted[j, 2] - lifted[i, 2]
+        zk = lifted[k, 2] - lifted[i, 2]
+        det = a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0]
+        valid = np.abs(det) >= 1e-9
+        det = np.where(valid, det, 1.0)
+        centers = np.column_stack(((zj * b[:, 1] - zk * a[:, 1]) / det,
+                                   (a[:, 0] * zk - b[:, 0] * zj) / det))[valid]
+        triples = triples[valid]
+
+    return [(Point(float(x), float(y)), (int(i), int(j), int(k)))
+            for (x, y), (i, j, k) in zip(centers, triples)]
+
+def validate_power_vertices(vertices, circles, bounding_box, eps=1e-9):
+   """
+   Mantém os vértices dentro do bounding box que não caem dentro de nenhum
+   círculo, usando uma cKDTree sobre os centros.
+   vertices: lista de (Point, simplex), como em power_diagram_vertices
+   return: lista de (Point, folga, simplex), folga = distância ao círculo mais próximo
+   """
+   if not vertices or not circles:
+      return []
+
+   # filtro do bounding box em lote
+   xs = [p.x for p in bounding_box]
+   ys = [p.y for p in bounding_box]
+   pts = np.array([(v.x, v.y) for v, _ in vertices], dtype=np.float64)
+   inside = ((pts[:, 0] >= min(xs)) & (pts[:, 0] <= max(xs)) &
+             (pts[:, 1] >= min(ys)) & (pts[:, 1] <= max(ys)))
+   candidates = np.nonzero(inside)[0]
+   if len(candidates) == 0:
+      return []
+
+   centers = np.array([(c.center.x, c.center.y) for c in circles], dtype=np.float64)
+   radii = np.array([c.radius for c in circles], dtype=np.float64)
+   tree = cKDTree(centers)
+
+   # Nenhum círculo fica mais perto da borda do que d_nn - r_nn + r_max,
+   # então basta olhar os centros dentro desse raio
+   query = pts[candidates]
+   nearestDist, nearest = tree.query(query)
+   reach = np.maximum(nearestDist - radii[nearest], 0) + radii.max()
+   neighbours = tree.query_ball_point(query, reach)
+
+   valid = []
+   for index, ball, q in zip(candidates, neighbours, query):
+      ball = np.asarray(ball, dtype=np.intp)
+      clearance = (np.sqrt(((centers[ball] - q) ** 2).sum(axis=1)) - radii[ball]).min()
+      if clearance >= -eps:
+         v, simplex = vertices[index]
+         valid.append((v, float(clearance), simplex))
+   return valid
+
+def circle_pairs(circles, eps=1e-9):
+   """
+   Pares de círculos cujas bordas se cruzam ou se tocam, por fora ou por
+   dentro, cada par aparece uma vez. Um círculo dentro de outro sem tocar
+   a borda não entra em nenhuma lista.
+   return: (intersecting, tangent), listas de (i, j) com i < j
+   """
+   if len(circles) < 2:
+      return [], []
+
+   centers = np.array([(c.center.x, c.center.y) for c in circles], dtype=np.float64)
+   radii = np.array([c.radius for c in circles], dtype=np.float64)
+   tree = cKDTree(centers)
+
+   # Nenhum par com centros a mais de 2 r_max + eps se encosta
+   pairs = tree.query_pairs(2 * radii.max() + eps, output_type='ndarray')
+   i, j = pairs[:, 0], pairs[:, 1]
+   dist = np.sqrt(((centers[i] - centers[j]) ** 2).sum(axis=1))
+   gap = dist - radii[i] - radii[j]
+   # Negativo quando um círculo fica dentro do outro e as bordas não se encontram
+   inner = dist - np.abs(radii[i] - radii[j])
+
+   touching = (np.abs(gap) <= eps) | (np.abs(inner) <= eps)
+   crossing = (gap < 0) & (inner > 0) & ~touching
+   intersecting = [(int(a), int(b)) for a, b in np.sort(pairs[crossing], axis=1)]
+   tangent = [(int(a), int(b)) for a, b in np.sort(pairs[touching], axis=1)]
+   return intersecting, tangent
 
 if __name__ == "__main__":
+   import matplotlib.pyplot as plt
+
    fig, ax = plt.subplots(figsize=(6, 5))
 
 
@@ -109,28 +211,14 @@ if __name__ == "__main__":
    circles = triangle.getCircles()
    
    # points = [c.center for c in circles]
-   # vertices = voronoi_vertices_from_delaunay(points)
+   # vertices = voronoi_vertices_from_delaunay(points, asPoints=True)
    # for v, simplex in vertices:
    #    v.plot(ax, color='green')
 
    vertexes = power_diagram_vertices(circles)
    voronoi_circles = []
-   for v, simplex in vertexes:
-      min_dist = float('inf')
-      validPoint = True
-      for circle in circles:
-         if circle.pointIsInside(v):
-            validPoint = False
-         elif triangle.pointInBoundingBox(v) == False:
-            validPoint = False
-            break
-         else:
-            dist = circle.center.distanceToPoint(v) - circle.radius
-            if dist < min_dist:
-               min_dist = dist
-         
-      if validPoint:
-         voronoi_circles.append(Circle(v, circles[simplex[0]].distanceToPoint(v)))
+   for v, clearance, simplex in validate_power_vertices(vertexes, circles, bounding_box):
+      voronoi_circles.append(Circle(v, circles[simplex[0]].distanceToPoint(v)))
      
 
    
@@ -161,14 +249,11 @@ if __name__ == "__main__":
    #    circle.plot(ax, color='purple', linestyle='--')
 
    circles = triangle.getCircles() 
-   for circle in circles:
-      for c in circles:
-         if circle == c:
-            continue
-         if circle.circleIntersects(c):
-            c.plot(ax, color='gray', linestyle='--')
-         if circle.circleTouches(c):
-            # c.plot(ax, color='purple', linestyle='--')
-            continue
+   intersecting, tangent = circle_pairs(circles)
+   for i, j in intersecting:
+      circles[i].plot(ax, color='gray', linestyle='--')
+      circles[j].plot(ax, color='gray', linestyle='--')
+   # for i, j in tangent:
+   #    circles[j].plot(ax, color='purple', linestyle='--')
 
    plt.show()
\ No newline at end of file
@@ -1,10 +1,14 @@
-import matplotlib.pyplot as plt
+import logging
+import predicates
+
+_logger = logging.getLogger(__name__)
 
 class Point:
-    def __init__(self, x: float, y: float, isPoint=True):
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x: float, y: float):
         self.x = x
         self.y = y
-        self.isPoint = True
 
     def __eq__(self, other):
         return self.x == other.x and self.y == other.y
@@ -13,7 +17,7 @@ class Point:
         return Point(self.x + other.x, self.y + other.y)
 
     def __sub__(self, other):
-        return Point(self.x - other.x, self.y - other.y, isPoint=False)
+        return Point(self.x - other.x, self.y - other.y)
     
     def __mul__(self, scalar: float):
         return Point(self.x * scalar, self.y * scalar)
@@ -22,8 +26,23 @@ class Point:
         return hash((self.x, self.y))
     
     def same_point(p1, p2, eps=1e-6):
+        eps = predicates.tolerance(eps, p1.x, p1.y, p2.x, p2.y)
         return abs(p1.x - p2.x) < eps and abs(p1.y - p2.y) < eps
-    
+
+    def dot(self, other):
+        return self.x * other.x + self.y * other.y
+
+    def cross(self, other):
+        return self.x * other.y - self.y * other.x
+
+    def distanceToLine(self, ini, end):
+        # Perpendicular distance to the infinite line through ini and end
+        line_vec = end - ini
+        line_len = (line_vec.x ** 2 + line_vec.y ** 2) ** 0.5
+        if line_len == 0:
+            return ((self.x - ini.x) ** 2 + (self.y - ini.y) ** 2) ** 0.5
+        return abs(line_vec.cross(self - ini)) / line_len
+
     def distanceToSegment(self, ini, end):
         # Compute the projection of this point onto the line defined by ini and end
         line_vec = end - ini
@@ -48,19 +67,41 @@ class Point:
         return f"Point({self.x}, {self.y})"
     
     def draw (self, ax, color='black'):
-        ax.plot(self.x, self.y, marker='o', color=color)
+        from render import draw_point
+        draw_point(self, ax, color)
 
     def draw_seg(self, point, ax, color='black'):
-        ax.plot([self.x, point.x], [self.y, point.y], color=color)
+        from render import draw_segment
+        draw_segment(self, point, ax, color)
 
 class Edge:
+    __slots__ = ('ini', 'end', '_direction')
+
     def __init__(self, ini:Point, end:Point):
         self.ini = ini
         self.end = end
+        self._direction = None
     
     def length(self):
         return ((self.end.x - self.ini.x) ** 2 + (self.end.y - self.ini.y) ** 2) ** 0.5
 
+    def direction(self):
+        # The endpoints never move, so it is worked out once
+        if self._direction is None:
+            self._direction = (self.end - self.ini).normalize()
+        return self._direction
+
+    def lineIntersection(self, other):
+        # Intersection of the infinite lines supporting both edges
+        d1 = self.end - self.ini
+        d2 = other.end - other.ini
+        det = predicates.orientation(self.ini.x, self.ini.y, self.end.x, self.end.y,
+                                     other.ini.x, other.ini.y, other.end.x, other.end.y)
+        if det == 0:
+            return None  # Parallel lines
+        t = (other.ini - self.ini).cross(d2) / det
+        return Point(self.ini.x + t * d1.x, self.ini.y + t * d1.y)
+
     def __eq__(self, value):
         return (self.ini == value.ini and self.end == value.end) or (self.ini == value.end and self.end == value.ini)
     
@@ -73,40 +114,63 @@ class Edge:
         return f"Edge star({self.ini}), end({self.end})"
     
     def draw(self, ax, color='black'):
-        ax.plot([self.ini.x, self.end.x], [self.ini.y, self.end.y], color=color)
+        from render import draw_segment
+        draw_segment(self.ini, self.end, ax, color)
 
 class Ray:
+    __slots__ = ('origin', 'direction')
+
     def __init__(self, origin:Point, direction:Point):
         self.origin = origin
         self.direction = direction.normalize()
-        self.isRay = True
 
-    def intersect(self, other):
+    def intersect(self, other, eps=1e-9):
         # Resolve P1 + t1*b1 = P2 + t2*b2
         p1, b1 = self.origin, self.direction
         p2, b2 = other.origin, other.direction
         dx = p2.x - p1.x
         dy = p2.y - p1.y
-        det = b1.x * b2.y - b1.y * b2.x
+        det = predicates.cross(b1.x, b1.y, b2.x, b2.y)
         if det == 0:
-            print("No intersection: parallel lines")
+            _logger.debug("No intersection: parallel lines")
             return None  # Parallel lines
 
         t1 = (dx * b2.y - dy * b2.x) / det
         t2 = (dx * b1.y - dy * b1.x) / det
 
-        if t1 < 0 or t2 < 0:
-            print("No intersection: t1 =", t1, ", t2 =", t2)
+        if t1 < -eps or t2 < -eps:
+            _logger.debug("No intersection: t1 = %s, t2 = %s", t1, t2)
             return None  # Intersection is behind the ray origin
         
         else:
             intersection_point = Point(p1.x + t1 * b1.x, p1.y + t1 * b1.y)
             return intersection_point , t1, t2
 
+    def intersectLine(self, other):
+        # Same as intersect, but the other ray is taken as a full line
+        p1, b1 = self.origin, self.direction
+        p2, b2 = other.origin, other.direction
+        det = predicates.cross(b1.x, b1.y, b2.x, b2.y)
+        if det == 0:
+            return None
+
+        t1 = ((p2.x - p1.x) * b2.y - (p2.y - p1.y) * b2.x) / det
+        if t1 < 0:
+            return None
+        return Point(p1.x + t1 * b1.x, p1.y + t1 * b1.y), t1
+
 
     def draw(self, ax, length=10.0, color='black'):
-        end_point = self.origin + self.direction.normalize() * length
-        ax.plot([self.origin.x, end_point.x], [self.origin.y, end_point.y], color=color)
+        from render import draw_ray
+        draw_ray(self, ax, length, color)
+
+class Disc:
+    # Center and radius only, all the power diagram and circle pair code reads
+    __slots__ = ('center', 'radius')
+
+    def __init__(self, center:Point, radius:float):
+        self.center = center
+        self.radius = radius
 
 if __name__ == "__main__":
     pass
\ No newline at end of file
@@ -0,0 +1,69 @@
+import math
+import sys
+import tracemalloc
+from geometry import *
+from Lav import *
+from Event import *
+
+def unslotted(cls, name):
+    # Copy of cls without __slots__, so every instance keeps its attributes in a __dict__
+    # like before. A subclass would not do, it keeps the slots and adds a __dict__ on top.
+    hidden = set(cls.__slots__) | {'__slots__', '__dict__', '__weakref__'}
+    return type(name, (), {key: value for key, value in vars(cls).items() if key not in hidden})
+
+# Dict backed copies of the classes, laid out like before __slots__
+class DictPoint(unslotted(Point, 'DictPointBase')):
+    def __init__(self, x, y):
+        super().__init__(x, y)
+        self.isPoint = True
+
+DictEdge = unslotted(Edge, 'DictEdge')
+
+class DictRay(unslotted(Ray, 'DictRayBase')):
+    def __init__(self, origin, direction):
+        super().__init__(origin, direction)
+        self.isRay = True
+
+DictVertex = unslotted(Vertex, 'DictVertex')
+DictEvent = unslotted(Event, 'DictEvent')
+
+
+def allocated(build):
+    # Bytes still allocated after build() returns, the result is kept alive
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+def buildVertices(n, pointCls, edgeCls, rayCls, vertexCls):
+    points = [pointCls(math.cos(2 * math.pi * i / n), math.sin(2 * math.pi * i / n)) for i in range(n)]
+    edges = [edgeCls(points[i], points[(i + 1) % n]) for i in range(n)]
+    vertices = [vertexCls(points[i], edges[i - 1], edges[i]) for i in range(n)]
+    for i in range(n):
+        vertices[i].link(vertices[(i + 1) % n])
+    for vertex in vertices:
+        # Bisector of a regular polygon points to the center
+        vertex.rayDirection = rayCls(vertex.point, pointCls(-vertex.point.x, -vertex.point.y))
+    return vertices
+
+def buildEvents(vertices, pointCls, eventCls):
+    n = len(vertices)
+    return [eventCls(pointCls(0.0, 0.0), 1.0, 'edge', vertices[i], vertices[(i + 1) % n]) for i in range(n)]
+
+def measure(n, pointCls, edgeCls, rayCls, vertexCls, eventCls):
+    vertexBytes, vertices = allocated(lambda: buildVertices(n, pointCls, edgeCls, rayCls, vertexCls))
+    eventBytes, events = allocated(lambda: buildEvents(vertices, pointCls, eventCls))
+    return vertexBytes / n, eventBytes / n
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    before = measure(n, DictPoint, DictEdge, DictRay, DictVertex, DictEvent)
+    after = measure(n, Point, Edge, Ray, Vertex, Event)
+
+    print(f"{n} vertices")
+    print(f"{'':10} {'bytes/vertex':>14} {'bytes/event':>14}")
+    print(f"{'dict':10} {before[0]:14.1f} {before[1]:14.1f}")
+    print(f"{'slots':10} {after[0]:14.1f} {after[1]:14.1f}")
@@ -0,0 +1,217 @@
+import bisect
+import math
+import sys
+import numpy as np
+import predicates
+
+# Cleanup of the input rings before StraightSkeleton builds its LAVs.
+# Repeated and collinear vertices only make zero length bisectors and
+# wasted events, and a self intersecting ring has no straight skeleton.
+# Every pass but the intersection sweep works on whole coordinate arrays,
+# and the kept vertices are the input Point objects themselves, so
+# GridPoints stay GridPoints.
+
+def _coords(points):
+    return np.array([(p.x, p.y) for p in points], dtype=np.float64).reshape(-1, 2)
+
+def _orientation(a, b, c):
+    # (b - a) x (c - a) row by row, with the exact sign like predicates.orientation
+    left = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1])
+    right = (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])
+    cross = left - right
+    unsure = np.flatnonzero(np.abs(cross) <= predicates.ERROR_BOUND * (np.abs(left) + np.abs(right)))
+    predicates.counters["orientation"] += len(cross) - len(unsure)
+    for i in unsure:
+        cross[i] = predicates.orientation(a[i, 0], a[i, 1], b[i, 0], b[i, 1], a[i, 0], a[i, 1], c[i, 0], c[i, 1])
+    return cross
+
+def _dropOnePerRun(marked):
+    # Of consecutive marked vertices only the first goes in one pass, the
+    # others are looked at again against their new neighbours
+    if marked.all():
+        # Degenerate ring, every other vertex goes
+        return np.arange(len(marked)) % 2 == 1
+    return marked & ~np.roll(marked, 1)
+
+def merge_duplicates(coords, eps):
+    # Indices of the vertices kept once every vertex within eps of the previous one is merged into it
+    kept = np.arange(len(coords))
+    while len(kept) > 2:
+        ring = coords[kept]
+        step = ring - np.roll(ring, 1, axis=0)
+        drop = _dropOnePerRun(np.hypot(step[:, 0], step[:, 1]) <= eps)
+        if not drop.any():
+            break
+        kept = kept[~drop]
+    return kept
+
+def drop_collinear(coords, sine=1e-9):
+    """
+    Indices of the vertices kept once every vertex where the ring goes
+    straight on, or folds back onto itself, is removed. A vertex is
+    collinear when the sine of its turn is within sine.
+    """
+    kept = np.arange(len(coords))
+    while len(kept) > 2:
+        ring = coords[kept]
+        previous = np.roll(ring, 1, axis=0)
+        following = np.roll(ring, -1, axis=0)
+        cross = _orientation(previous, ring, following)
+        lengths = np.hypot(*(ring - previous).T) * np.hypot(*(following - ring).T)
+        drop = _dropOnePerRun(np.abs(cross) <= sine * lengths)
+        if not drop.any():
+            break
+        kept = kept[~drop]
+    return kept
+
+def signed_areas(rings):
+    # Shoelace formula on every ring, positive for counter clockwise ones
+    return [0.5 * float(np.sum(ring[:, 0] * np.roll(ring[:, 1], -1) - np.roll(ring[:, 0], -1) * ring[:, 1]))
+            for ring in rings]
+
+def _sign(value):
+    return (value > 0) - (value < 0)
+
+def _meet(p, q, r, s):
+    # Whether the segments pq and rs touch or cross, with exact orientation signs
+    if (max(p[0], q[0]) < min(r[0], s[0]) or max(r[0], s[0]) < min(p[0], q[0]) or
+            max(p[1], q[1]) < min(r[1], s[1]) or max(r[1], s[1]) < min(p[1], q[1])):
+        return False
+    o1 = _sign(predicates.orientation(p[0], p[1], q[0], q[1], p[0], p[1], r[0], r[1]))
+    o2 = _sign(predicates.orientation(p[0], p[1], q[0], q[1], p[0], p[1], s[0], s[1]))
+    o3 = _sign(predicates.orientation(r[0], r[1], s[0], s[1], r[0], r[1], p[0], p[1]))
+    o4 = _sign(predicates.orientation(r[0], r[1], s[0], s[1], r[0], r[1], q[0], q[1]))
+    # Touching counts, and collinear edges with overlapping boxes overlap
+    return o1 * o2 <= 0 and o3 * o4 <= 0
+
+def find_intersections(rings):
+    """
+    Pairs ((ring, i), (ring, j)) of edges that touch or cross, edge i
+    going from vertex i to vertex i + 1 of its ring. Edges sharing a
+    vertex are left out. A Shamos-Hoey sweep along x keeps the edges cut
+    by the sweep line ordered by y and only tests edges when they become
+    neighbours there. The order means nothing past the first pair found,
+    so the list holds at most one pair, and is empty for simple rings.
+    Rings must not fold back onto themselves, drop_collinear sees to that.
+    """
+    starts = np.concatenate(rings)
+    ends = np.concatenate([np.roll(ring, -1, axis=0) for ring in rings])
+    ringOf = np.concatenate([np.full(len(ring), k) for k, ring in enumerate(rings)]).tolist()
+    indexOf = np.concatenate([np.arange(len(ring)) for ring in rings]).tolist()
+    sizes = [len(ring) for ring in rings]
+
+    # Every edge goes from its lower end to its upper one in (x, y) order
+    swap = (ends[:, 0] < starts[:, 0]) | ((ends[:, 0] == starts[:, 0]) & (ends[:, 1] < starts[:, 1]))
+    lows = np.where(swap[:, None], ends, starts)
+    highs = np.where(swap[:, None], starts, ends)
+    dx = highs[:, 0] - lows[:, 0]
+    slopes = np.full(len(dx), np.inf)
+    np.divide(highs[:, 1] - lows[:, 1], dx, out=slopes, where=dx > 0)
+    # Edges go in before any goes out at the same x, so edges that only touch there meet in the sweep
+    count = len(starts)
+    xs = np.concatenate([lows[:, 0], highs[:, 0]])
+    ys = np.concatenate([lows[:, 1], highs[:, 1]])
+    leaving = np.repeat([False, True], count)
+    events = np.lexsort((ys, leaving, xs)).tolist()
+    lows, highs, slopes, xs = lows.tolist(), highs.tolist(), slopes.tolist(), xs.tolist()
+
+    def neighbours(a, b):
+        gap = abs(indexOf[a] - indexOf[b])
+        return ringOf[a] == ringOf[b] and (gap == 1 or gap == sizes[ringOf[a]] - 1)
+
+    def found(a, b):
+        return not neighbours(a, b) and _meet(lows[a], highs[a], lows[b], highs[b])
+
+    def pair(a, b):
+        return [tuple(sorted(((ringOf[a], indexOf[a]), (ringOf[b], indexOf[b]))))]
+
+    def key(e):
+        # Height at the sweep line, then the order just after it, or just before it for edges ending there
+        slope = slopes[e]
+        if slope == math.inf:
+            return lows[e][1], slope
+        height = lows[e][1] + (x - lows[e][0]) * slope
+        return height, slope if x < highs[e][0] else -slope
+
+    active = []
+    x = None
+    for event in events:
+        edge = event % count
+        x = xs[event]
+        if event < count:
+            at = bisect.bisect_left(active, key(edge), key=key)
+            active.insert(at, edge)
+            for other in active[max(at - 1, 0):at] + active[at + 1:at + 2]:
+                if found(edge, other):
+                    return pair(edge, other)
+        else:
+            # Heights only tie where edges touch, so the edge is at or just after the first one as high
+            height = key(edge)[0]
+            at = bisect.bisect_left(active, height, key=lambda e: key(e)[0])
+            try:
+                at = active.index(edge, at, at + 64)
+            except ValueError:
+                at = active.index(edge)
+            del active[at]
+            if 0 < at < len(active) and found(active[at - 1], active[at]):
+                return pair(active[at - 1], active[at])
+    return []
+
+def cleanup_polygon(points, holes=(), eps=1e-9, sine=1e-9):
+    """
+    Returns (points, holes, report). The outline comes out counter
+    clockwise and the holes clockwise, without near duplicate or collinear
+    vertices. eps is relative to the size of the coordinates, like the
+    tolerances of predicates. Holes left with less than three vertices are
+    dropped. report holds the vertices in and out, how many were merged or
+    dropped as collinear, the holes dropped, the rings reversed and the
+    intersecting edge pair from find_intersections, if any.
+    """
+    rings = [list(points)] + [list(hole) for hole in holes]
+    report = {"vertices_in": sum(len(ring) for ring in rings), "merged": 0, "collinear": 0,
+              "dropped_holes": 0, "reversed": 0}
+    coords = [_coords(ring) for ring in rings]
+    scale = max((float(np.abs(ring).max()) for ring in coords if len(ring)), default=0.0)
+    eps = predicates.tolerance(eps, scale)
+
+    cleaned = []
+    for k, (ring, xy) in enumerate(zip(rings, coords)):
+        kept = merge_duplicates(xy, eps)
+        report["merged"] += len(xy) - len(kept)
+        collinear = drop_collinear(xy[kept], sine)
+        report["collinear"] += len(kept) - len(collinear)
+        kept = kept[collinear]
+        if len(kept) < 3:
+            if k == 0:
+                raise ValueError("the outline has less than three vertices after cleanup")
+            report["dropped_holes"] += 1
+            continue
+        cleaned.append(([ring[i] for i in kept], xy[kept], k == 0))
+
+    oriented = []
+    for (ring, xy, outline), area in zip(cleaned, signed_areas([xy for _, xy, _ in cleaned])):
+        if (area > 0) != outline:
+            ring, xy = ring[::-1], xy[::-1]
+            report["reversed"] += 1
+        oriented.append((ring, xy))
+
+    report["intersections"] = find_intersections([xy for _, xy in oriented])
+    report["vertices_out"] = sum(len(ring) for ring, _ in oriented)
+    report["removed"] = report["vertices_in"] - report["vertices_out"]
+    return oriented[0][0], [ring for ring, _ in oriented[1:]], report
+
+if __name__ == "__main__":
+    import json
+    from geometry import Point
+    if len(sys.argv) != 2:
+        print("usage: python polygonCleanup.py polygons.json")
+        sys.exit(1)
+    with open(sys.argv[1], 'r') as f:
+        data = json.load(f)
+    for name, info in data.items():
+        outline = [Point(x, y) for x, y in info["points"]]
+        holes = [[Point(x, y) for x, y in hole] for hole in info.get("holes", [])]
+        _, _, report = cleanup_polygon(outline, holes)
+        print(f"{name}: {report['vertices_in']} -> {report['vertices_out']} vertices, "
+              f"merged {report['merged']}, collinear {report['collinear']}, "
+              f"reversed {report['reversed']}, intersecting edges {report['intersections'] or 'none'}")
@@ -0,0 +1,73 @@
+import math
+import random
+from geometry import *
+
+# Deterministic polygon generators shared by the tests and the benchmarks,
+# outlines counter clockwise and holes clockwise
+
+def random_star(n, seed):
+    # Simple star shaped polygon, one vertex and one radius per random angle
+    rng = random.Random(seed)
+    angles = sorted(rng.uniform(0, 2 * math.pi) for _ in range(n))
+    return [Point(math.cos(a) * r, math.sin(a) * r) for a in angles for r in [rng.uniform(3, 10)]]
+
+def regular_polygon(n, seed, jitter=1e-9):
+    # Almost regular, most edge events happen at nearly the same time and place
+    rng = random.Random(seed)
+    return [Point(math.cos(2 * math.pi * i / n) + rng.uniform(-jitter, jitter),
+                  math.sin(2 * math.pi * i / n) + rng.uniform(-jitter, jitter)) for i in range(n)]
+
+def comb_polygon(n, seed):
+    # Base bar with teeth of random height, two reflex vertices per valley
+    rng = random.Random(seed)
+    teeth = max(1, (n - 2) // 4)
+    points = [Point(0.0, 0.0), Point(2.0 * teeth, 0.0)]
+    for i in reversed(range(teeth)):
+        top = 1.0 + rng.uniform(0.5, 3.0)
+        points += [Point(2.0 * i + 2, top), Point(2.0 * i + 1, top), Point(2.0 * i + 1, 1.0), Point(2.0 * i, 1.0)]
+    return points
+
+def holes_polygon(n, seed):
+    # Half of the vertices on a star outline, the rest on small turned square holes, as (outline, holes)
+    rng = random.Random(seed)
+    m = max(3, n // 2)
+    # One radius per vertex keeps the outline simple, holes must not cross it
+    points = []
+    for i in range(m):
+        radius = rng.uniform(3.0, 10.0)
+        points.append(Point(math.cos(2 * math.pi * i / m) * radius, math.sin(2 * math.pi * i / m) * radius))
+    count = max(1, (n - len(points)) // 4)
+    side = max(1, math.ceil(math.sqrt(count)))
+    # The outline never comes closer than 3 cos(pi / m) to the origin
+    extent = 2.0 * math.cos(math.pi / m)
+    size = 2 * extent / side
+    holes = []
+    for k in range(count):
+        cx = -extent + (k % side + 0.5) * size
+        cy = -extent + (k // side + 0.5) * size
+        radius = size * rng.uniform(0.2, 0.3)
+        angle = rng.uniform(0, math.pi / 2)
+        # Clockwise, so the polygon stays on the left of every edge
+        holes.append([Point(cx + radius * math.cos(angle - i * math.pi / 2),
+                            cy + radius * math.sin(angle - i * math.pi / 2)) for i in range(4)])
+    return points, holes
+
+def triangle_holes_polygon(n, count, seed):
+    # Star outline with count triangular holes of random size and turn thrown in at random, as (outline, holes)
+    rng = random.Random(seed)
+    outline = [Point(math.cos(2 * math.pi * i / n) * r, math.sin(2 * math.pi * i / n) * r)
+               for i in range(n) for r in [rng.uniform(3.0, 10.0)]]
+    reach = 3.0 * math.cos(math.pi / n)
+    # Circles around the holes that do not overlap keep the holes apart
+    circles = []
+    while len(circles) < count:
+        radius = rng.uniform(0.1, 0.8)
+        x, y = rng.uniform(-reach, reach), rng.uniform(-reach, reach)
+        if math.hypot(x, y) + radius < reach and all(math.hypot(x - cx, y - cy) > radius + r for cx, cy, r in circles):
+            circles.append((x, y, radius))
+    holes = []
+    for x, y, radius in circles:
+        angle = rng.uniform(0, 2 * math.pi)
+        holes.append([Point(x + radius * math.cos(angle - k * 2.1), y + radius * math.sin(angle - k * 2.1))
+                      for k in range(3)])
+    return outline, holes
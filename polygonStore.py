@@ -0,0 +1,103 @@
+import json
+import os
+import sys
+import numpy as np
+from geometry import *
+
+class PolygonStore:
+    """
+    Directory of .npy arrays opened as memory maps:
+      coords.npy   (N, 2) float64, every ring one after the other
+      rings.npy    (R + 1,) int64, offsets of each ring in coords
+      polygons.npy (P + 1,) int64, offsets of each polygon in rings,
+                   the first ring of a polygon is the outline, the rest are holes
+      names.json   list with the name of each polygon
+    """
+    def __init__(self, path):
+        self.path = path
+        self.coords = np.load(os.path.join(path, 'coords.npy'), mmap_mode='r')
+        self.rings = np.load(os.path.join(path, 'rings.npy'), mmap_mode='r')
+        self.polygons = np.load(os.path.join(path, 'polygons.npy'), mmap_mode='r')
+        with open(os.path.join(path, 'names.json'), 'r') as f:
+            self.names = json.load(f)
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def _ring(self, r):
+        return self.coords[self.rings[r]:self.rings[r + 1]]
+
+    def arrays(self, name):
+        # Views into the memory map, nothing is read until they are used
+        p = self.index[name]
+        first, last = self.polygons[p], self.polygons[p + 1]
+        return self._ring(first), [self._ring(r) for r in range(first + 1, last)]
+
+    def load(self, name):
+        outline, holes = self.arrays(name)
+        return ([Point(float(x), float(y)) for x, y in outline],
+                [[Point(float(x), float(y)) for x, y in hole] for hole in holes])
+
+    def __iter__(self):
+        # (name, points, holes), one polygon at a time
+        for name in self.names:
+            points, holes = self.load(name)
+            yield name, points, holes
+
+    def write(path, polygons):
+        """
+        Writes (name, points, holes) tuples, points and holes as lists of
+        [x, y], into a store at path. Coordinates are streamed to disk so
+        the whole library never sits in memory.
+        """
+        os.makedirs(path, exist_ok=True)
+        rawPath = os.path.join(path, 'coords.bin')
+        names = []
+        rings = [0]
+        polygonOffsets = [0]
+        with open(rawPath, 'wb') as raw:
+            for name, points, holes in polygons:
+                for ring in [points] + list(holes):
+                    array = np.asarray(ring, dtype=np.float64).reshape(-1, 2)
+                    array.tofile(raw)
+                    rings.append(rings[-1] + len(array))
+                polygonOffsets.append(len(rings) - 1)
+                names.append(name)
+
+        # Give the raw coordinates an .npy header, copying in blocks
+        total = rings[-1]
+        coords = np.lib.format.open_memmap(os.path.join(path, 'coords.npy'), mode='w+',
+                                           dtype=np.float64, shape=(total, 2))
+        if total:
+            source = np.memmap(rawPath, dtype=np.float64, mode='r', shape=(total, 2))
+            block = 1 << 20
+            for start in range(0, total, block):
+                coords[start:start + block] = source[start:start + block]
+            del source
+        coords.flush()
+        del coords
+        os.remove(rawPath)
+
+        np.save(os.path.join(path, 'rings.npy'), np.array(rings, dtype=np.int64))
+        np.save(os.path.join(path, 'polygons.npy'), np.array(polygonOffsets, dtype=np.int64))
+        with open(os.path.join(path, 'names.json'), 'w') as f:
+            json.dump(names, f)
+        return PolygonStore(path)
+
+def convert_json(filepath, path):
+    # polygons.json format -> PolygonStore
+    with open(filepath, 'r') as f:
+        data = json.load(f)
+    return PolygonStore.write(path, ((name, info["points"], info.get("holes", []))
+                                     for name, info in data.items()))
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python polygonStore.py polygons.json store_dir")
+        sys.exit(1)
+    store = convert_json(sys.argv[1], sys.argv[2])
+    print(f"{len(store)} polygons, {len(store.coords)} points")
@@ -0,0 +1,63 @@
+from fractions import Fraction
+
+# Filtered predicates. The float determinant is trusted when it is farther
+# from zero than its rounding error bound, otherwise it is recomputed with
+# Fractions, which hold every float exactly. The value returned always has
+# the exact sign, so the callers keep testing it against zero.
+
+EPSILON = 2.0 ** -53
+# Bound for a difference of two products of differences (Shewchuk's ccwerrboundA)
+ERROR_BOUND = (3.0 + 16.0 * EPSILON) * EPSILON
+# Tolerances never go below this many ulps of the magnitudes compared
+RELATIVE_EPS = 2.0 ** -40
+
+# How many times each predicate ran, and how many of those took the exact path
+counters = {
+    "cross": 0,
+    "cross_exact": 0,
+    "orientation": 0,
+    "orientation_exact": 0,
+    "orientation_grid": 0,
+}
+
+def reset_counters():
+    for name in counters:
+        counters[name] = 0
+
+def snapshot():
+    return dict(counters)
+
+def uncertain(left, right):
+    # True when left - right is too close to zero to trust its sign
+    return abs(left - right) <= ERROR_BOUND * (abs(left) + abs(right))
+
+def cross(ux, uy, vx, vy):
+    # ux * vy - uy * vx with the exact sign
+    counters["cross"] += 1
+    left = ux * vy
+    right = uy * vx
+    if not uncertain(left, right):
+        return left - right
+    counters["cross_exact"] += 1
+    return float(Fraction(ux) * Fraction(vy) - Fraction(uy) * Fraction(vx))
+
+def orientation(ax, ay, bx, by, cx, cy, dx, dy):
+    # (b - a) x (d - c) with the exact sign, negative when d - c turns clockwise
+    counters["orientation"] += 1
+    left = (bx - ax) * (dy - cy)
+    right = (by - ay) * (dx - cx)
+    if not uncertain(left, right):
+        return left - right
+    counters["orientation_exact"] += 1
+    ux = Fraction(bx) - Fraction(ax)
+    uy = Fraction(by) - Fraction(ay)
+    return float(ux * (Fraction(dy) - Fraction(cy)) - uy * (Fraction(dx) - Fraction(cx)))
+
+def orientation_grid(ax, ay, bx, by, cx, cy, dx, dy):
+    # Same as orientation for integer grid coordinates, Python ints never round
+    counters["orientation_grid"] += 1
+    return (bx - ax) * (dy - cy) - (by - ay) * (dx - cx)
+
+def tolerance(eps, *values):
+    # eps, unless the values are so large that eps is below their precision
+    return max(eps, RELATIVE_EPS * max(abs(value) for value in values))
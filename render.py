@@ -0,0 +1,64 @@
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection, PatchCollection
+from matplotlib.patches import Circle as CirclePatch
+
+# Drawing helpers, only imported when something is drawn so the solver
+# modules stay free of matplotlib. Every helper adds a fixed number of
+# artists, whatever the number of segments or points.
+
+def draw_segments(segments, ax, color='black', linewidth=1.0):
+    # segments: [((x0, y0), (x1, y1)), ...]
+    segments = list(segments)
+    if segments:
+        ax.add_collection(LineCollection(segments, colors=color, linewidths=linewidth))
+        ax.autoscale_view()
+
+def draw_points(points, ax, color='black', size=20):
+    # points: [(x, y), ...]
+    points = list(points)
+    if points:
+        ax.scatter([p[0] for p in points], [p[1] for p in points], s=size, color=color, zorder=3)
+
+def draw_circles(circles, ax, color='black', linestyle='-'):
+    # Anything with center.x, center.y and radius
+    patches = [CirclePatch((c.center.x, c.center.y), c.radius) for c in circles]
+    if patches:
+        ax.add_collection(PatchCollection(patches, facecolors='none', edgecolors=color, linestyles=linestyle))
+        ax.autoscale_view()
+
+def draw_point(point, ax, color='black'):
+    draw_points([(point.x, point.y)], ax, color)
+
+def draw_segment(ini, end, ax, color='black'):
+    draw_segments([((ini.x, ini.y), (end.x, end.y))], ax, color)
+
+def draw_ray(ray, ax, length=10.0, color='black'):
+    end_point = ray.origin + ray.direction.normalize() * length
+    draw_segment(ray.origin, end_point, ax, color)
+
+def lav_points(lav):
+    points = []
+    vertex = lav.head
+    while True:
+        vertex = vertex.next
+        points.append((vertex.point.x, vertex.point.y))
+        if vertex.first:
+            break
+    return points
+
+def draw_lav(lav, ax, colorE='black', colorP='green'):
+    points = lav_points(lav)
+    draw_segments(zip(points, points[1:] + points[:1]), ax, colorE)
+    draw_points(points, ax, colorP)
+
+def draw_graph(graph, ax, colorP='blue', colorE='red'):
+    draw_segments((((e.ini.x, e.ini.y), (e.end.x, e.end.y)) for e in graph.edges), ax, colorP)
+    draw_points(((v.x, v.y) for v in graph.vertices), ax, colorE)
+
+def draw_skeleton_arrays(result, ax, colorP='blue', colorE='red'):
+    # Straight from the SkeletonArrays, without building the set based graph
+    vertices = result.vertices
+    if len(result.arcs):
+        ax.add_collection(LineCollection(vertices[result.edges], colors=colorP))
+        ax.autoscale_view()
+    draw_points(vertices, ax, colorE)
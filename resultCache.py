@@ -0,0 +1,183 @@
+import hashlib
+import os
+import sys
+import tempfile
+import numpy as np
+from straightSkeleton import *
+
+# Bumped whenever the key or the stored arrays change meaning
+CACHE_VERSION = 1
+
+class ResultCache:
+    """
+    On-disk cache of StraightSkeleton and power diagram results, shared by
+    every process that opens the same directory. Each entry is one .npz
+    file named by the hash of its canonical input:
+      polygons  rings oriented like StraightSkeleton does, each ring rotated
+                to start at its lowest vertex, holes sorted, coordinates
+                quantized to multiples of quantum
+      circles   (x, y, r) quantized and sorted
+    With translation=True the input is first moved so its canonical first
+    vertex is at the origin, results are stored relative to it and moved
+    back on load. Entries are written to a temporary file and renamed, and
+    the least recently used ones are removed once the directory holds more
+    than maxBytes.
+    """
+    def __init__(self, path, maxBytes=256 * 2 ** 20, quantum=1e-9, translation=True):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.maxBytes = maxBytes
+        self.quantum = quantum
+        self.translation = translation
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self.size = sum(size for _, size, _ in self.entries())
+
+    def entries(self):
+        # (path, bytes, last use) of every entry
+        entries = []
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if entry.name.endswith('.npz'):
+                    try:
+                        info = entry.stat()
+                    except FileNotFoundError:
+                        continue  # removed by another process
+                    entries.append((entry.path, info.st_size, info.st_mtime))
+        return entries
+
+    def _quantize(self, coords):
+        scaled = np.rint(np.asarray(coords, dtype=np.float64).reshape(len(coords), -1) / self.quantum)
+        if len(scaled) and np.abs(scaled).max() >= 2 ** 62:
+            raise ValueError("coordinates too large for the cache quantum")
+        return scaled.astype(np.int64)
+
+    def _canonicalRing(self, points, ccw):
+        ring = self._quantize([(p.x, p.y) for p in orient(points, ccw)])
+        start = np.lexsort((ring[:, 1], ring[:, 0]))[0]
+        return np.roll(ring, -start, axis=0)
+
+    def _key(self, kind, arrays):
+        digest = hashlib.sha256(f"{kind}:{CACHE_VERSION}:{self.quantum!r}:{self.translation}".encode())
+        for array in arrays:
+            digest.update(np.int64(len(array)).tobytes())
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    def polygonKey(self, points, holes=()):
+        # (key, offset), offset being what was taken out of the coordinates
+        outline = self._canonicalRing(points, True)
+        rings = sorted((self._canonicalRing(hole, False) for hole in holes), key=lambda ring: ring.tolist())
+        origin = outline[0].copy() if self.translation else np.zeros(2, dtype=np.int64)
+        key = self._key("skeleton", [ring - origin for ring in [outline] + rings])
+        return key, origin * self.quantum
+
+    def circlesKey(self, circles):
+        # (key, offset, order), canonical circle i is circles[order[i]]
+        quantized = self._quantize([(c.center.x, c.center.y, c.radius) for c in circles])
+        order = np.lexsort((quantized[:, 2], quantized[:, 1], quantized[:, 0]))
+        quantized = quantized[order]
+        origin = np.zeros(3, dtype=np.int64)
+        if self.translation:
+            origin[:2] = quantized[0, :2]
+        key = self._key("power", [quantized - origin])
+        return key, origin[:2] * self.quantum, order
+
+    def _file(self, key):
+        return os.path.join(self.path, key + '.npz')
+
+    def get(self, key):
+        # Dict of the stored arrays, or None
+        path = self._file(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                entry = {name: data[name] for name in data.files}
+            os.utime(path)
+        except FileNotFoundError:
+            self.stats["misses"] += 1
+            return None
+        except (OSError, ValueError):
+            # Unreadable entry, drop it and compute again
+            self._remove(path)
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return entry
+
+    def put(self, key, **arrays):
+        fd, temporary = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(temporary, self._file(key))
+        except BaseException:
+            self._remove(temporary)
+            raise
+        self.stats["stores"] += 1
+        self.size += os.path.getsize(self._file(key))
+        if self.size > self.maxBytes:
+            self.evict()
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        # Oldest entries first, the size is recounted since other processes write too
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        self.size = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self.size <= self.maxBytes:
+                break
+            self._remove(path)
+            self.size -= size
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            self._remove(path)
+        self.size = 0
+
+    def skeleton(self, points, holes=()):
+        # SkeletonArrays of the polygon, computed only the first time it is seen
+        key, offset = self.polygonKey(points, holes)
+        entry = self.get(key)
+        if entry is not None:
+            return SkeletonArrays.fromArrays(entry["vertices"] + offset, entry["edges"], entry["times"])
+        skeleton = StraightSkeleton(points, holes)
+        skeleton.run()
+        result = skeleton.skeletonResult
+        self.put(key, vertices=result.vertices - offset, edges=result.edges, times=result.times)
+        return result
+
+    def powerDiagram(self, circles):
+        # Same as foldAndCut.power_diagram_vertices, with the triples in input indices
+        from foldAndCut import power_diagram_vertices
+        if len(circles) < 3:
+            return []
+        key, offset, order = self.circlesKey(circles)
+        entry = self.get(key)
+        if entry is None:
+            vertices = power_diagram_vertices(circles)
+            rank = np.empty(len(order), dtype=np.int64)
+            rank[order] = np.arange(len(order))
+            centers = np.array([(p.x, p.y) for p, _ in vertices], dtype=np.float64).reshape(-1, 2)
+            triples = np.array([rank[list(triple)] for _, triple in vertices], dtype=np.int64).reshape(-1, 3)
+            self.put(key, centers=centers - offset, triples=triples)
+            return vertices
+        centers = entry["centers"] + offset
+        triples = np.sort(order[entry["triples"]], axis=1)
+        return [(Point(float(x), float(y)), (int(i), int(j), int(k)))
+                for (x, y), (i, j, k) in zip(centers, triples)]
+
+    def hitRate(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("usage: python resultCache.py cache_dir")
+        sys.exit(1)
+    cache = ResultCache(sys.argv[1])
+    print(f"{len(cache.entries())} entries, {cache.size} bytes")
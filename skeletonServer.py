@@ -0,0 +1,392 @@
+import argparse
+import asyncio
+import collections
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from batchSkeleton import PolygonTimeout, check_rings, skeleton_job, time_limit
+from geometry import *
+
+# Local HTTP service, over TCP or a Unix socket:
+#   POST /skeleton  {"points": [...], "holes": [...]} or a polygons.json style dict
+#   POST /power     {"circles": [[x, y, r], ...]}
+#   GET  /metrics   latency, throughput and queue figures
+# A request may carry a deadline in seconds, as "deadline" in the body or
+# as an X-Deadline header.
+
+def power_job(job):
+    # Runs in a worker process, like skeleton_job
+    name, circles, timeout = job
+    start = time.perf_counter()
+    try:
+        with time_limit(timeout):
+            from foldAndCut import power_diagram_vertices
+            vertices = power_diagram_vertices([Disc(Point(x, y), r) for x, y, r in circles])
+        return {
+            "name": name,
+            "status": "ok",
+            "seconds": time.perf_counter() - start,
+            "vertices": [[p.x, p.y] for p, _ in vertices],
+            "triples": [list(triple) for _, triple in vertices],
+        }
+    except PolygonTimeout:
+        return {"name": name, "status": "timeout", "seconds": time.perf_counter() - start}
+    except Exception as error:
+        return {"name": name, "status": "error", "seconds": time.perf_counter() - start,
+                "error": f"{type(error).__name__}: {error}"}
+
+def run_jobs(jobs):
+    """
+    One batch of ("skeleton" | "power", expires, job) in one worker call.
+    expires is on the time.monotonic clock, which every process of the
+    machine shares. The jobs run one after the other, so each one gets the
+    time left when it starts, and the ones already late are not run.
+    """
+    results = []
+    for kind, expires, job in jobs:
+        left = expires - time.monotonic()
+        if left <= 0:
+            results.append({"name": job[0], "status": "timeout", "seconds": 0.0})
+        elif kind == "skeleton":
+            name, points, holes, cachePath = job
+            results.append(skeleton_job((name, points, holes, left, cachePath)))
+        else:
+            name, circles = job
+            results.append(power_job((name, circles, left)))
+    return results
+
+def worker_context():
+    # Workers forked from the server process would inherit the sockets of the
+    # clients connected at that time, a fork server starts them clean
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["batchSkeleton"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+class Overloaded(Exception):
+    pass
+
+class Metrics:
+    """
+    Counters since start, and latencies, completion times and batch sizes
+    of the last window requests.
+    """
+    def __init__(self, window=4096):
+        self.started = time.monotonic()
+        self.counters = collections.Counter()
+        self.latencies = collections.deque(maxlen=window)
+        self.completions = collections.deque(maxlen=window)
+        self.batchSizes = collections.deque(maxlen=window)
+
+    def done(self, status, latency):
+        self.counters[status] += 1
+        self.latencies.append(latency)
+        self.completions.append(time.monotonic())
+
+    def batch(self, size):
+        self.counters["batches"] += 1
+        self.batchSizes.append(size)
+
+    def percentile(self, values, q):
+        return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+    def snapshot(self, queueDepth, inFlight):
+        latencies = sorted(self.latencies)
+        now = time.monotonic()
+        recent = [t for t in self.completions if now - t <= 10.0]
+        span = min(10.0, now - self.started)
+        return {
+            "uptime": now - self.started,
+            "counters": dict(self.counters),
+            "queue": queueDepth,
+            "batchesInFlight": inFlight,
+            "latency": {
+                "p50": self.percentile(latencies, 0.5),
+                "p90": self.percentile(latencies, 0.9),
+                "p99": self.percentile(latencies, 0.99),
+                "max": latencies[-1] if latencies else None,
+            },
+            "throughput": len(recent) / span if span > 0 else 0.0,
+            "meanBatch": sum(self.batchSizes) / len(self.batchSizes) if self.batchSizes else None,
+        }
+
+
+class SkeletonService:
+    """
+    Requests wait in a bounded queue and are sent to the process pool in
+    batches of up to batchSize, waiting at most batchDelay seconds for a
+    batch to fill. At most maxBatches batches run at once. Once they are
+    all busy the queue fills up, and new requests are turned away until
+    there is room again. Requests whose deadline passes while queued are
+    never sent, and the worker gets the deadline itself, so a job that
+    waits behind others of its batch only gets the time that is left.
+    """
+    def __init__(self, workers=None, maxPending=256, batchSize=16, batchDelay=0.002,
+                 maxBatches=None, deadline=30.0, cachePath=None):
+        self.workers = workers or os.cpu_count()
+        self.maxPending = maxPending
+        self.batchSize = batchSize
+        self.batchDelay = batchDelay
+        self.maxBatches = maxBatches or 2 * self.workers
+        self.deadline = deadline
+        self.cachePath = cachePath
+        self.metrics = Metrics()
+        self.pool = None
+        self.queue = None
+        self.inFlight = 0
+
+    async def start(self):
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=worker_context())
+        self.queue = asyncio.Queue(self.maxPending)
+        self.slots = asyncio.Semaphore(self.maxBatches)
+        self.batches = set()
+        self.dispatcher = asyncio.create_task(self.dispatch())
+
+    async def close(self):
+        self.dispatcher.cancel()
+        for task in list(self.batches):
+            task.cancel()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    async def submit(self, kind, payload, deadline=None):
+        # Result dict of one job, raises Overloaded when the queue is full.
+        # Deadlines are on the time.monotonic clock, the workers check them too
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        expires = start + (deadline if deadline is not None else self.deadline)
+        future = loop.create_future()
+        try:
+            self.queue.put_nowait((kind, payload, future, expires))
+        except asyncio.QueueFull:
+            self.metrics.counters["rejected"] += 1
+            raise Overloaded()
+        try:
+            result = await asyncio.wait_for(future, expires - start)
+        except asyncio.TimeoutError:
+            result = {"name": payload[0], "status": "timeout"}
+        self.metrics.done(result["status"], time.monotonic() - start)
+        return result
+
+    async def dispatch(self):
+        while True:
+            batch = [await self.queue.get()]
+            if self.batchDelay and self.queue.qsize() < self.batchSize - 1:
+                await asyncio.sleep(self.batchDelay)
+            while len(batch) < self.batchSize and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            await self.slots.acquire()
+            task = asyncio.create_task(self.runBatch(batch))
+            self.batches.add(task)
+            task.add_done_callback(self.batches.discard)
+
+    async def runBatch(self, batch):
+        loop = asyncio.get_running_loop()
+        self.inFlight += 1
+        try:
+            now = time.monotonic()
+            live = [(kind, payload, future, expires) for kind, payload, future, expires in batch
+                    if not future.done() and expires > now]
+            if not live:
+                return
+            jobs = []
+            for kind, payload, _, expires in live:
+                if kind == "skeleton":
+                    name, points, holes = payload
+                    jobs.append((kind, expires, (name, points, holes, self.cachePath)))
+                else:
+                    jobs.append((kind, expires, payload))
+            self.metrics.batch(len(jobs))
+            try:
+                results = await loop.run_in_executor(self.pool, run_jobs, jobs)
+            except Exception as error:
+                results = [{"name": payload[0], "status": "error", "error": f"{type(error).__name__}: {error}"}
+                           for _, payload, _, _ in live]
+            for (_, _, future, _), result in zip(live, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self.inFlight -= 1
+            self.slots.release()
+
+    def snapshot(self):
+        return self.metrics.snapshot(self.queue.qsize(), self.inFlight)
+
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 503: "Service Unavailable",
+               504: "Gateway Timeout"}
+RESULT_CODES = {"ok": 200, "timeout": 504, "error": 400}
+
+async def read_request(reader):
+    # (method, path, headers, body) of one HTTP/1.1 request, None at end of stream
+    line = await reader.readline()
+    if not line:
+        return None
+    method, path, _ = line.decode('latin-1').split(' ', 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        headers[key.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    body = await reader.readexactly(length) if length else b''
+    return method, path, headers, body
+
+def write_response(writer, code, payload, keepAlive=True, extra=()):
+    body = json.dumps(payload).encode()
+    head = [f"HTTP/1.1 {code} {STATUS_TEXT[code]}", "Content-Type: application/json",
+            f"Content-Length: {len(body)}", f"Connection: {'keep-alive' if keepAlive else 'close'}"]
+    head += list(extra)
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body)
+
+async def handle(service, method, path, headers, body):
+    # (status code, payload, extra headers)
+    if method == "GET" and path == "/metrics":
+        return 200, service.snapshot(), ()
+    if method != "POST" or path not in ("/skeleton", "/power"):
+        return 404, {"error": f"no route for {method} {path}"}, ()
+    try:
+        request = json.loads(body or b'{}')
+        deadline = request.pop("deadline", None) if isinstance(request, dict) else None
+        if "x-deadline" in headers:
+            deadline = float(headers["x-deadline"])
+        if path == "/power":
+            jobs = {request.get("name", "circles"): ("power", (request.get("name", "circles"),
+                                                               [tuple(c) for c in request["circles"]]))}
+        elif "points" in request:
+            name = request.get("name", "polygon")
+            jobs = {name: ("skeleton", (name, request["points"], request.get("holes", [])))}
+        else:
+            # polygons.json schema, several polygons in one request
+            jobs = {name: ("skeleton", (name, info["points"], info.get("holes", [])))
+                    for name, info in request.items()}
+        for kind, payload in jobs.values():
+            if kind == "skeleton":
+                check_rings(payload[1], payload[2])
+    except (ValueError, KeyError, TypeError, AttributeError) as error:
+        return 400, {"error": f"bad request: {error}"}, ()
+
+    try:
+        results = await asyncio.gather(*(service.submit(kind, payload, deadline)
+                                         for kind, payload in jobs.values()))
+    except Overloaded:
+        return 503, {"error": "too many pending requests"}, ("Retry-After: 1",)
+    if len(results) == 1 and (path == "/power" or "points" in request):
+        return RESULT_CODES.get(results[0]["status"], 400), results[0], ()
+    return 200, dict(zip(jobs, results)), ()
+
+async def serve_connection(service, reader, writer):
+    try:
+        while True:
+            request = await read_request(reader)
+            if request is None:
+                break
+            method, path, headers, body = request
+            keepAlive = headers.get("connection", "keep-alive").lower() != "close"
+            code, payload, extra = await handle(service, method, path, headers, body)
+            write_response(writer, code, payload, keepAlive, extra)
+            await writer.drain()
+            if not keepAlive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+async def serve(service, host="127.0.0.1", port=8765, unixPath=None):
+    await service.start()
+    handler = lambda reader, writer: serve_connection(service, reader, writer)
+    if unixPath:
+        server = await asyncio.start_unix_server(handler, path=unixPath)
+    else:
+        server = await asyncio.start_server(handler, host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+async def load_test(polygons, requests, concurrency, host="127.0.0.1", port=8765, unixPath=None):
+    """
+    Sends requests POST /skeleton calls over concurrency keep-alive
+    connections, cycling through polygons, and prints what the client saw.
+    """
+    bodies = [json.dumps({"name": name, "points": points, "holes": holes}).encode()
+              for name, points, holes in polygons]
+    latencies = []
+    codes = collections.Counter()
+    counter = iter(range(requests))
+
+    async def client():
+        if unixPath:
+            reader, writer = await asyncio.open_unix_connection(unixPath)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        for i in counter:
+            body = bodies[i % len(bodies)]
+            start = time.perf_counter()
+            writer.write((f"POST /skeleton HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                          f"Content-Length: {len(body)}\r\n\r\n").encode('latin-1') + body)
+            await writer.drain()
+            status = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':')[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            codes[int(status.split()[1])] += 1
+        writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"{requests} requests in {elapsed:.2f}s, {requests / elapsed:.1f} req/s, codes {dict(codes)}")
+    print(f"latency p50={latencies[len(latencies) // 2] * 1000:.1f}ms "
+          f"p99={latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000:.1f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local straight skeleton and power diagram service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="listen on this Unix socket instead of TCP")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--max-pending", type=int, default=256, help="queued requests before 503")
+    parser.add_argument("--batch-size", type=int, default=16, help="requests sent to a worker at a time")
+    parser.add_argument("--batch-delay", type=float, default=0.002, help="seconds waited for a batch to fill")
+    parser.add_argument("--deadline", type=float, default=30.0, help="default seconds allowed per request")
+    parser.add_argument("--cache", default=None, help="ResultCache directory shared by the workers")
+    parser.add_argument("--load-test", metavar="POLYGONS", default=None,
+                        help="instead of serving, load test a running server with these polygons")
+    parser.add_argument("--requests", type=int, default=1000, help="requests sent by --load-test")
+    parser.add_argument("--concurrency", type=int, default=16, help="connections opened by --load-test")
+    args = parser.parse_args(argv)
+
+    if args.load_test:
+        from batchSkeleton import read_polygons
+        polygons = list(read_polygons(args.load_test))
+        asyncio.run(load_test(polygons, args.requests, args.concurrency, args.host, args.port, args.unix))
+        return 0
+
+    service = SkeletonService(args.workers, args.max_pending, args.batch_size, args.batch_delay,
+                              deadline=args.deadline, cachePath=args.cache)
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
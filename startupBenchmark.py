@@ -0,0 +1,28 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Import cost of the solver in a fresh interpreter, with and without the
+# rendering module that used to be pulled in by geometry.py
+
+CASES = {
+    "interpreter": "pass",
+    "straightSkeleton": "import straightSkeleton",
+    "straightSkeleton + render": "import straightSkeleton, render",
+}
+
+def startup_time(code, repeat=10):
+    here = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=here, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    for name, code in CASES.items():
+        print(f"{name:28} {startup_time(code, repeat) * 1000:8.1f} ms")
@@ -2,10 +2,16 @@ from Lav import *
 from geometry import *
 from Event import *
 from Skeleton import *
+from EdgeGrid import *
+from Wavefront import *
+from fixedGrid import *
 import heapq
+import itertools
 import json
+import math
+import predicates
 
-def load_json(filepath,polygon):
+def load_json(filepath,polygon, withHoles=False):
     points = []
     holes = []
     with open (filepath, 'r') as f:
@@ -14,8 +20,45 @@ def load_json(filepath,polygon):
         if name == polygon:
             for p in info["points"]:
                 points.append(Point(p[0], p[1])) 
+            for hole in info.get("holes", []):
+                holes.append([Point(p[0], p[1]) for p in hole])
+    if withHoles:
+        return points, holes
     return points
 
+def signed_area(points):
+    # Shoelace formula, positive for counter clockwise rings
+    area = 0.0
+    for i in range(len(points)):
+        a = points[i - 1]
+        b = points[i]
+        area += a.x * b.y - b.x * a.y
+    return area / 2
+
+def orient(points, ccw=True):
+    # The outline runs counter clockwise and the holes clockwise,
+    # so the inside of the polygon is always on the left of an edge
+    if (signed_area(points) > 0) != ccw:
+        return points[::-1]
+    return points
+
+def bounds(points):
+    xs = [p.x for p in points]
+    ys = [p.y for p in points]
+    return min(xs), min(ys), max(xs), max(ys)
+
+def contains(points, point):
+    # Even-odd rule
+    inside = False
+    for i in range(len(points)):
+        a = points[i - 1]
+        b = points[i]
+        if (a.y > point.y) != (b.y > point.y):
+            x = a.x + (point.y - a.y) * (b.x - a.x) / (b.y - a.y)
+            if x > point.x:
+                inside = not inside
+    return inside
+
 def build_polygon(points):
     n = len(points)
     
@@ -34,22 +77,106 @@ def build_polygon(points):
     old_vertex.next = init_vertex
     init_vertex.prev = old_vertex
 
+    # Each vertex keeps the original edges on both sides
+    vertex = init_vertex
+    while True:
+        edge = Edge(vertex.point, vertex.next.point)
+        vertex.edgeRight = edge
+        vertex.next.edgeLeft = edge
+        vertex = vertex.next
+        if vertex is init_vertex:
+            break
+
     return init_vertex
 
 
 class StraightSkeleton:
-    def __init__(self, polygon_points):
-        self.polygon_points = polygon_points
-        self.slav = Slav()
-        self.eventQueue = []
-        self.skeletonGraph = graph()
-        self.buildFirstLAV(polygon_points)
-        self.inicializeEventQueue()
+    # A LAV edge or ray placed over more than this many entries of the other kind
+    # only goes as far as its vertices travel in TRAVEL_CELLS cells, and on from there later
+    CROWDED = 32
+    TRAVEL_CELLS = 4
+
+    def __init__(self, polygon_points, holes=(), vectorized=False, instrumentation=None, grid=None,
+                 cleanup=False):
+        # Counters, timers and hooks, the default one does nothing
+        self.stats = instrumentation if instrumentation is not None else NullInstrumentation()
+        # A FixedGrid, or its quantum, snaps the input to integer coordinates
+        if grid is not None and not isinstance(grid, FixedGrid):
+            grid = FixedGrid(grid)
+        self.grid = grid
+        if grid is not None:
+            polygon_points = grid.snap(polygon_points)
+            holes = [grid.snap(hole) for hole in holes]
+        # Repeated and collinear vertices out, see polygonCleanup
+        self.cleanupReport = None
+        if cleanup:
+            # Loads NumPy, so only when asked for
+            from polygonCleanup import cleanup_polygon
+            with self.stats.phase("cleanup"):
+                polygon_points, holes, report = cleanup_polygon(polygon_points, holes)
+            self.cleanupReport = report
+            for name in ("removed", "merged", "collinear", "dropped_holes"):
+                self.stats.count("cleanup_" + name, report[name])
+            if report["intersections"]:
+                first, second = report["intersections"][0]
+                raise ValueError(f"self intersecting polygon, edges {first} and {second} meet")
+        self.polygon_points = orient(polygon_points, ccw=True)
+        self.holes = [orient(hole, ccw=False) for hole in holes]
+        rings = [self.polygon_points] + self.holes
+        self.predicateCounters = predicates.snapshot()
+        self.bisectorCounters = dict(bisectorCounters)
+        self.slav = Slav(EdgeGrid(rings))
+        self.eventQueue = EventQueue(instrumentation=self.stats, grid=grid)
+        # Edge event time of every vertex with its next one, the time each
+        # reflex vertex dies at the latest, and the time and original edge of its queued split
+        self.edgeTimes = {}
+        self.splitLimits = {}
+        self.pendingSplits = {}
+        self.pendingEdges = {}
+        # Times the LAV edges, with the right end they had, and the rays are placed for,
+        # and the ones cut short by when they end
+        self.edgeWindows = {}
+        self.rayWindows = {}
+        self.edgeUntil = {}
+        self.rayUntil = {}
+        self.replacements = []
+        self.replacementOrder = itertools.count()
+        # Where and when the rays placed start and their clocks, see EdgeGrid
+        self.rayClocks = {}
+        # The first split of each reflex vertex while the LAV edges are placed the first time
+        self.seeded = None
+        # Without rays the LAV edges find nothing, they are placed once the first ray is
+        self.edgesPlaced = False
+        # No point is farther than half the narrow side of the box from the outline
+        minX, minY, maxX, maxY = bounds(self.polygon_points)
+        self.maxTime = min(maxX - minX, maxY - minY) / 2 * (1 + 1e-9) + 1e-9
+        self.skeletonResult = SkeletonArrays()
+        # Lifetime of every wavefront vertex, for the offset curves
+        self.wavefront = WavefrontTimeline()
+        # The outline and the holes start as LAVs of the same piece
+        region = set()
+        if vectorized:
+            # Same LAV, the per vertex geometry and the first sweeps of the LAV edges done in NumPy
+            # give the events up to rounding
+            from LavArrays import LavArrays
+            with self.stats.phase("lav_build"):
+                built = []
+                for k, ring in enumerate(rings):
+                    arrays = LavArrays(ring)
+                    built.append((self.buildFirstLAVArrays(ring, arrays, region, 1 if k == 0 else -1), arrays))
+            with self.stats.phase("queue_init"):
+                self.inicializeEventQueueArrays(built)
+        else:
+            with self.stats.phase("lav_build"):
+                for k, ring in enumerate(rings):
+                    self.buildFirstLAV(ring, region, 1 if k == 0 else -1)
+            with self.stats.phase("queue_init"):
+                self.inicializeEventQueue()
 
     def findEdgeEvent(vertexA, vertexB):
         if vertexB is not None:
   
-            if vertexA == vertexB:
+            if vertexA is vertexB:
                 return None
 
             vertexA.bisecting()
@@ -59,19 +186,341 @@ class StraightSkeleton:
 
             intersection = rayA.intersect(rayB)
             if intersection is None:
+                # Bisectors that do not cross still meet if both vertices already coincide
+                time = max(vertexA.creationTime(), vertexB.creationTime())
+                point = vertexB.positionAt(time)
+                if Point.same_point(vertexA.positionAt(time), point):
+                    return Event(point, time, 'edge', vertexA, vertexB)
                 return None
 
             point, t1, t2 = intersection
 
-            distance = point.distanceToSegment(vertexA.point, vertexB.point)
+            if vertexA.edgeRight is not None:
+                distance = point.distanceToLine(vertexA.edgeRight.ini, vertexA.edgeRight.end)
+            else:
+                distance = point.distanceToSegment(vertexA.point, vertexB.point)
 
             return Event(point, distance, 'edge', vertexA, vertexB)
         else:
             raise ValueError("Vertex does not have a next vertex.")
 
-    def findSplitEvent(self, vertex):
-        # Implement the logic to find the split event for the given vertex
-        pass
+    def splitTime(point, direction, k, startTime, edge, eps=1e-9):
+        # (s, time): a vertex moving from point along direction meets the wavefront line of edge
+        # s further, None if it never does. Along the bisector the vertex is at distance
+        # startTime + s*k from its own edge lines, and at d0 + s*m from the line of edge
+        ux = edge.end.x - edge.ini.x
+        uy = edge.end.y - edge.ini.y
+        length = (ux * ux + uy * uy) ** 0.5
+        if length == 0:
+            return None
+        nx, ny = -uy / length, ux / length
+        m = nx * direction.x + ny * direction.y
+        if k - m <= eps:
+            return None
+        s = (nx * (point.x - edge.ini.x) + ny * (point.y - edge.ini.y) - startTime) / (k - m)
+        if s < 0:
+            return None
+        return s, startTime + s * k
+
+    def splitPoint(vertex, edge, eps=1e-9):
+        # (point, time) where the reflex vertex meets the wavefront line of edge, if ever
+        direction = vertex.rayDirection.direction
+        k = abs(direction.cross(vertex.edgeLeft.direction()))
+        hit = StraightSkeleton.splitTime(vertex.point, direction, k, vertex.creationTime(), edge, eps)
+        if hit is None:
+            return None
+        return vertex.point + direction * hit[0], hit[1]
+
+    def onPiece(vertex, left, point, eps=1e-9):
+        # True when point lies inside the region swept by the LAV edge left -> left.next
+        right = left.next
+        if left is vertex or right is vertex or left.lav.region is not vertex.lav.region:
+            return False
+        # The vertex reaches the edges next to its neighbours only through
+        # its edge event with that neighbour, which comes first
+        if left is vertex.next or right is vertex.prev:
+            return False
+        if left.rayDirection.direction.cross(point - left.point) > eps:
+            return False
+        if right.rayDirection.direction.cross(point - right.point) < -eps:
+            return False
+        return True
+
+    def splitCandidate(vertex, left, begin=-math.inf, end=math.inf, eps=1e-9):
+        # Point where the reflex vertex hits the wavefront of the LAV edge left -> left.next
+        # between the times begin and end
+        edge = left.edgeRight
+        if edge is vertex.edgeLeft or edge is vertex.edgeRight:
+            return None
+        hit = StraightSkeleton.splitPoint(vertex, edge, eps)
+        if hit is None or hit[1] < begin - eps or hit[1] > end + eps:
+            return None
+        if not StraightSkeleton.onPiece(vertex, left, hit[0], eps):
+            return None
+        return Event(hit[0], hit[1], 'split', vertex, None, edge)
+
+    def edgeTime(self, vertex):
+        # Time of the edge event of vertex with its next vertex, inf if they never meet
+        cached = self.edgeTimes.get(vertex)
+        if cached is not None and cached[0] is vertex.next:
+            return cached[1]
+        event = StraightSkeleton.findEdgeEvent(vertex, vertex.next)
+        time = event.time if event is not None else math.inf
+        self.edgeTimes[vertex] = (vertex.next, time)
+        return time
+
+    def travelTime(self, vertex, now):
+        # Time the vertex is TRAVEL_CELLS cells of the index away from where it is at now,
+        # or as far again as it came, so the placements of a long lived vertex grow
+        k = abs(vertex.rayDirection.direction.cross(vertex.edgeLeft.direction()))
+        if k == 0:
+            return math.inf
+        return max(now + self.TRAVEL_CELLS * self.slav.edgeIndex.cellSize * k, 2 * now - vertex.creationTime())
+
+    def cutShort(self, table, vertex, until, kind):
+        table[vertex] = until
+        heapq.heappush(self.replacements, (until, next(self.replacementOrder), kind, vertex))
+
+    def sweepKeys(self, vertex, now, until):
+        # Cells of the trapezoid the LAV edge of vertex sweeps from now until then
+        right = vertex.next
+        return self.slav.edgeIndex.sweepKeys((vertex.positionAt(now), right.positionAt(now),
+                                              right.positionAt(until), vertex.positionAt(until)))
+
+    def placeEdge(self, vertex, now, sweep=None):
+        # Places the LAV edge of vertex over what it sweeps from now until one of its ends may die,
+        # or less where many rays wait, and queues the splits of the rays placed there.
+        # sweep is (until, keys) from LavArrays.sweeps, used if it ends at the same time
+        right = vertex.next
+        if not self.edgesPlaced or not vertex.isAlive or right is None or right is vertex:
+            return
+        index = self.slav.edgeIndex
+        horizon = min(self.edgeTime(vertex.prev), self.edgeTime(vertex), self.edgeTime(right), self.maxTime,
+                      self.pendingSplits.get(vertex, math.inf), self.pendingSplits.get(right, math.inf))
+        horizon = max(horizon, now)
+        if self.stillPlaced(vertex, now, horizon):
+            return
+        if sweep is not None and sweep[0] == horizon:
+            keys = sweep[1]
+        else:
+            keys = self.sweepKeys(vertex, now, horizon)
+        self.edgeUntil.pop(vertex, None)
+        if index.raysOver(keys) > self.CROWDED:
+            until = min(self.travelTime(vertex, now), self.travelTime(right, now))
+            if until < horizon:
+                horizon = until
+                keys = self.sweepKeys(vertex, now, until)
+                self.cutShort(self.edgeUntil, vertex, until, 'edge')
+        self.edgeWindows[vertex] = (now, horizon, right)
+        clock = StraightSkeleton.edgeClock(vertex.edgeRight)
+        found = index.placeEdge(vertex, keys, clock, now, horizon)
+        self.stats.count("split_pairs", len(found))
+        for waiting in found:
+            # A ray meets the line of the edge once, a split queued on any piece of it is that one
+            if not waiting.isAlive or self.pendingEdges.get(waiting) is vertex.edgeRight:
+                continue
+            # Only when the wavefront line meets the ray while both are placed,
+            # before the split queued for the vertex and before it dies anyway
+            begin, end = self.rayWindows.get(waiting, (now, horizon))
+            latest = min(horizon, end, self.pendingSplits.get(waiting, math.inf),
+                         self.splitLimits.get(waiting, math.inf))
+            time = StraightSkeleton.meetTime(clock, self.rayClocks.get(waiting))
+            if time == math.inf:
+                continue
+            slack = 0 if time is None else 1e-7 * (1 + time)
+            if time is None or max(now, begin) - slack <= time <= latest + slack:
+                self.examineSplit(waiting, vertex, now, horizon)
+
+    def stillPlaced(self, vertex, now, horizon, eps=1e-9):
+        # True when the LAV edge of vertex ends no later than it is placed for and its right end
+        # stays between the ends it had, as a split that cuts it shorter leaves it. The sweep is
+        # then inside the one placed, and the rays there were paired with it already
+        window = self.edgeWindows.get(vertex)
+        if window is None or now < window[0] or horizon > window[1] or vertex not in self.slav.edgeIndex.edgeKeys:
+            return False
+        right, placed = vertex.next, window[2]
+        if right is placed:
+            return True
+        if placed.rayDirection is None or right.rayDirection is None:
+            return False
+        # The ends move along straight lines, between them at both times is between them all along
+        for time in (now, horizon):
+            start = vertex.positionAt(time)
+            span = placed.positionAt(time) - start
+            along = (right.positionAt(time) - start).dot(span)
+            length = span.dot(span)
+            if along < -eps * (1 + length) or along > length + eps * (1 + length):
+                return False
+        return True
+
+    def edgeClock(edge):
+        # The wavefront line of edge is over the point (x, y) at its distance from the line
+        ux = edge.end.x - edge.ini.x
+        uy = edge.end.y - edge.ini.y
+        length = (ux * ux + uy * uy) ** 0.5
+        if length == 0:
+            return None
+        nx, ny = -uy / length, ux / length
+        return -(nx * edge.ini.x + ny * edge.ini.y), nx, ny
+
+    def rayClock(self, vertex):
+        # A vertex k times slower than its edge lines is at the point (x, y) along its ray
+        # at its creation time and k times the way it went. Kept with where and when it starts
+        direction = vertex.rayDirection.direction
+        k = abs(direction.cross(vertex.edgeLeft.direction()))
+        if k == 0:
+            self.rayClocks.pop(vertex, None)
+            return None
+        gx, gy = direction.x * k, direction.y * k
+        x, y, start = vertex.point.x, vertex.point.y, vertex.creationTime()
+        self.rayClocks[vertex] = (x, y, start, gx, gy)
+        return start - gx * x - gy * y, gx, gy
+
+    def meetTime(clock, ray):
+        # Time the wavefront line with clock meets the ray started at (x, y) at start, inf if it
+        # never does, splitTime up to rounding. None without either clock
+        if clock is None or ray is None:
+            return None
+        c, nx, ny = clock
+        x, y, start, gx, gy = ray
+        ahead = c + nx * x + ny * y - start
+        speed = gx * gx + gy * gy
+        gain = speed - (nx * gx + ny * gy)
+        if gain <= 0 or ahead < -1e-9 * (1 + abs(start)):
+            return math.inf
+        return start + max(ahead, 0.0) * speed / gain
+
+    def examineSplit(self, vertex, left, now, horizon, eps=1e-9):
+        # Queues the split of vertex on the LAV edge of left, placed from now until horizon,
+        # if it comes while both are placed and before the one queued. Later ones come up
+        # when either is placed again
+        self.stats.count("split_candidates")
+        begin, end = self.rayWindows.get(vertex, (now, horizon))
+        event = StraightSkeleton.splitCandidate(vertex, left, max(now, begin), min(horizon, end))
+        if event is None or event.time > self.splitLimits.get(vertex, math.inf) + eps:
+            return
+        pending = self.pendingSplits.get(vertex)
+        if pending is not None and event.time >= pending:
+            return
+        if self.seeded is not None:
+            self.seeded[vertex] = event
+        else:
+            self.eventQueue.push(event)
+        self.pendingSplits[vertex] = event.time
+        self.pendingEdges[vertex] = event.opositeEdge
+
+    def rayKeys(self, vertex, begin, until):
+        # Cells of the ray of vertex between two times, clipped to the box
+        direction = vertex.rayDirection.direction
+        k = abs(direction.cross(vertex.edgeLeft.direction()))
+        length = max(0.0, (until - begin) / k) if k > 0 else math.inf
+        index = self.slav.edgeIndex
+        segment = index.clip(vertex.positionAt(begin), direction, length)
+        if segment is None:
+            segment = (vertex.point, vertex.point)
+        return index.segmentKeys(*segment)
+
+    def placeRay(self, vertex, begin, until):
+        # Places the ray of vertex from begin until it is TRAVEL_CELLS cells away, to go on later
+        # if it may live longer, and returns the owners of the LAV edges there and when it ends
+        if not self.edgesPlaced:
+            self.placeEdges(begin)
+        end = min(until, self.travelTime(vertex, begin))
+        self.rayUntil.pop(vertex, None)
+        if end < until:
+            self.cutShort(self.rayUntil, vertex, end, 'ray')
+        self.rayWindows[vertex] = (begin, end)
+        found = self.slav.edgeIndex.placeRay(vertex, self.rayKeys(vertex, begin, end),
+                                             self.rayClock(vertex), begin, end)
+        return found, end
+
+    def placeEdges(self, now):
+        # Every LAV edge, for the first ray
+        self.edgesPlaced = True
+        for lav in self.slav:
+            vertex = lav.head
+            while True:
+                self.placeEdge(vertex, now)
+                vertex = vertex.next
+                if vertex is lav.head:
+                    break
+
+    def findSplitEvent(self, vertex, notBefore=0, eps=1e-9):
+        """
+        Places the ray of a reflex vertex and returns its earliest split not
+        before notBefore on the LAV edges placed so far, None if it has one
+        queued already that is not later. The vertex dies by its edge events
+        with its neighbours or by the split it has queued at the latest, so
+        the ray stops there, or sooner where many LAV edges are placed.
+        """
+        if not vertex._isReflex or vertex.edgeLeft is None or vertex.edgeRight is None:
+            return None
+
+        direction = vertex.rayDirection.direction
+        k = abs(direction.cross(vertex.edgeLeft.direction()))
+        limit = min(self.edgeTime(vertex.prev), self.edgeTime(vertex), self.maxTime)
+        self.splitLimits[vertex] = limit
+        pending = self.pendingSplits.get(vertex)
+        startTime = vertex.creationTime()
+        begin = max(notBefore, startTime)
+        until = limit if pending is None else max(begin, min(limit, pending))
+        found, end = self.placeRay(vertex, begin, until)
+        self.stats.count("split_pairs", len(found))
+
+        best = None
+        # Earliest first, none of the LAV edges met later comes before the best split so far
+        for left in sorted(found, key=found.get):
+            if best is not None and found[left] > best.time:
+                break
+            edge = left.edgeRight
+            hit = StraightSkeleton.splitTime(vertex.point, direction, k, startTime, edge)
+            if hit is None or hit[1] < notBefore or hit[1] > limit + eps or best is not None and hit[1] >= best.time:
+                continue
+            # Met by the LAV edge when placed again, if it is still there then
+            window = self.edgeWindows.get(left)
+            if window is not None and not window[0] - eps <= hit[1] <= window[1] + eps:
+                continue
+            if edge is vertex.edgeLeft or edge is vertex.edgeRight:
+                continue
+            self.stats.count("split_candidates")
+            point = vertex.point + direction * hit[0]
+            if StraightSkeleton.onPiece(vertex, left, point):
+                best = Event(point, hit[1], 'split', vertex, None, edge)
+
+        if best is not None and best.time <= end:
+            # Gone before the ray would go on
+            self.rayUntil.pop(vertex, None)
+        if best is None or pending is not None and best.time >= pending:
+            return None
+        self.pendingSplits[vertex] = best.time
+        self.pendingEdges[vertex] = best.opositeEdge
+        return best
+
+    def pushSplitEvent(self, vertex, notBefore=0):
+        splitEvent = self.findSplitEvent(vertex, notBefore)
+        if splitEvent is not None:
+            self.eventQueue.push(splitEvent)
+
+    def pushEvents(self, vertex, eps=1e-9):
+        # Schedule the edge events with both neighbours and the split event, if any
+        prev, following = vertex.prev, vertex.next
+        edgeEventA = StraightSkeleton.findEdgeEvent(prev, vertex)
+        edgeEventB = StraightSkeleton.findEdgeEvent(vertex, following)
+
+        if edgeEventA is not None:
+            self.eventQueue.push(edgeEventA)
+        if edgeEventB is not None:
+            self.eventQueue.push(edgeEventB)
+        self.edgeTimes[prev] = (vertex, edgeEventA.time if edgeEventA is not None else math.inf)
+        self.edgeTimes[vertex] = (following, edgeEventB.time if edgeEventB is not None else math.inf)
+
+        # The LAV edges around the vertex and the rays of the reflex vertices
+        # next to it end at other times now, place them again
+        time = vertex.creationTime() - eps
+        for owner in (prev.prev, prev, vertex, following):
+            self.placeEdge(owner, time)
+        for owner in (prev, vertex, following):
+            self.pushSplitEvent(owner, time)
 
     def handleEdgeEvent(self, event):
         vertexA = event.vertexA
@@ -80,11 +529,11 @@ class StraightSkeleton:
 
         
         # Mark vertices as processed
-        vertexA.processed = True
-        vertexB.processed = True
+        lav.markProcessed(vertexA)
+        lav.markProcessed(vertexB)
 
         # Create a new vertex at the collision point
-        newVertex = Vertex(event.collision)
+        newVertex = Vertex(event.collision, vertexA.edgeLeft, vertexB.edgeRight)
 
         # Update the linked list to include the new vertex
         lav.insert_vertex_between(vertexA, vertexB, newVertex)
@@ -94,222 +543,786 @@ class StraightSkeleton:
         lav.remove_vertex(vertexA)
         lav.remove_vertex(vertexB)
 
+        # Update the skeleton graph
+        collision = self.eventNode(event.collision, event.time, (vertexA, vertexB))
+        newVertex.node = collision
+        self.traceVertex(vertexA, collision, event.time)
+        self.traceVertex(vertexB, collision, event.time)
+
+        if lav.count <= 2:
+            self.closeLav(lav, event.time)
+            return newVertex
+
         # Compute the bisecting ray for the new vertex
         newVertex.bisecting()
         newVertex.prev.bisecting()    
         newVertex.next.bisecting()
 
         # Schedule new events for the affected vertices
-        edgeEventA = StraightSkeleton.findEdgeEvent(newVertex.prev, newVertex)
-        edgeEventB = StraightSkeleton.findEdgeEvent(newVertex, newVertex.next)
-
-        if edgeEventA is not None:
-            heapq.heappush(self.eventQueue, edgeEventA)
-        if edgeEventB is not None:
-            heapq.heappush(self.eventQueue, edgeEventB)
-
-        # Update the skeleton graph
-        self.skeletonGraph.add_vertice(event.collision)
-        self.skeletonGraph.add_vertice(vertexA.point)
-        self.skeletonGraph.add_vertice(vertexB.point)
-        self.skeletonGraph.add_edge(Edge(vertexA.point, event.collision))
-        self.skeletonGraph.add_edge(Edge(vertexB.point, event.collision))
+        self.pushEvents(newVertex)
 
         return newVertex
         
 
-    def handleSplitEvent(self, event):
-        # Implement the logic to handle split events
-        pass
-    
-    def find_unprocessed_vertex(self):
-        for lav in self.slav.lavs:
-            vertex = lav.head
-            while True:
-                if not vertex.processed and vertex.isAlive:
-                    return vertex
-                vertex = vertex.next
-                if vertex.first:
-                    break
+    def splitTarget(self, event, eps=1e-9):
+        # Vertex whose live LAV edge the split event hits, None if that piece of the opposite edge is gone
+        for candidate in self.slav.edgeIndex.verticesOnEdge(event.opositeEdge):
+            if StraightSkeleton.onPiece(event.vertexA, candidate, event.collision, eps):
+                return candidate
         return None
-    
-    def find_simultaneous_events(self, cluster_events):
-        for event in self.eventQueue:
-            if event.isSimultaneous(cluster_events[0]):
-                if event.isValid():
-                    cluster_events.append(event)
-                    self.eventQueue.remove(event)
+
+    def handleSplitEvent(self, event, left):
+        # The reflex vertex of the event hits the LAV edge from left to left.next inside
+        vertex = event.vertexA
+        edge = event.opositeEdge
+        point = event.collision
+        lav = vertex.lav
+        right = left.next
+
+        lav.markProcessed(vertex)
+        # Reflex vertices that meet there split at the node of the first one
+        node = self.eventNode(point, event.time, (vertex, vertex.prev, vertex.next, left, right))
+        self.traceVertex(vertex, node, event.time)
+
+        # Relink as prev -> v1 -> right ... and left -> v2 -> next ...
+        # Within one LAV this splits it in two, across two LAVs it merges them
+        otherLav = left.lav
+        merge = otherLav is not lav
+        v1 = Vertex(point, vertex.edgeLeft, edge)
+        v2 = Vertex(point, edge, vertex.edgeRight)
+        v1.node = v2.node = node
+        vertex.prev.link(v1)
+        v1.link(right)
+        left.link(v2)
+        v2.link(vertex.next)
+
+        index = self.slav.edgeIndex
+        index.remove(vertex)
+        vertex.retire()
+        self.slav.unprocessed.pop(vertex, None)
+        region = lav.region
+        self.slav.removeLav(lav)
+        if merge:
+            self.slav.removeLav(otherLav)
+        # Turns around the rings through v1 and v2, vertex leaves them
+        turning = v1.turn() + v2.turn() - vertex.turn()
+
+        # Only the vertices of the smaller side change LAV, the bigger keeps its own
+        if merge:
+            kept = lav if lav.count >= otherLav.count else otherLav
+            kept.count = lav.count + otherLav.count + 1
+            kept.winding = StraightSkeleton.windingOf(2 * math.pi * (lav.winding + otherLav.winding) + turning)
+            if not kept.head.isAlive:
+                kept.head = v1
+            # The ring runs v1, right ... left, v2, vertex.next ... vertex.prev
+            if kept is lav:
+                kept.claim(v1, v2)
             else:
+                kept.claim(v2, v1)
+            newLavs = [kept]
+        else:
+            small, big, size = StraightSkeleton.smallerSide(v1, v2)
+            smallLav = Lav(small, index, self.slav.unprocessed)
+            smallLav.claim(small, small.prev)
+            smallLav.count = size
+            lav.count += 1 - size
+            # The bigger ring turns by whatever the smaller one does not
+            smallTurning = StraightSkeleton.turning(small)
+            smallLav.winding = StraightSkeleton.windingOf(smallTurning)
+            lav.winding = StraightSkeleton.windingOf(2 * math.pi * lav.winding + turning - smallTurning)
+            if not lav.head.isAlive or lav.head.lav is not lav:
+                lav.head = big
+            lav.claim(big, big)
+            newLavs = [smallLav, lav] if small is v1 else [lav, smallLav]
+        for head in (v1, v2):
+            index.update(head.prev)
+            index.update(head)
+
+        if merge:
+            self.slav.addLav(newLavs[0], region)
+        else:
+            self.splitRegion(region, newLavs, event.time, point)
+
+        for newLav in newLavs:
+            if newLav.count <= 2:
+                self.closeLav(newLav, event.time)
+        newVertices = [head for head in (v1, v2) if head.isAlive]
+
+        for newVertex in newVertices:
+            newVertex.bisecting()
+        for newVertex in newVertices:
+            self.pushEvents(newVertex)
+
+        self.stats.handled("split", event)
+        return newVertices
+    
+    def smallerSide(v1, v2):
+        # (head, other head, size) of the smaller of the rings through v1 and v2, walked in step
+        a, b, size = v1.next, v2.next, 1
+        while a is not v1 and b is not v2:
+            a, b, size = a.next, b.next, size + 1
+        return (v1, v2, size) if a is v1 else (v2, v1, size)
+
+    def turning(start):
+        # Sum of the turns around the ring through start
+        total = 0.0
+        vertex = start
+        while True:
+            total += vertex.turn()
+            vertex = vertex.next
+            if vertex is start:
+                return total
+
+    def windingOf(turning):
+        return round(turning / (2 * math.pi))
+
+    def splitRegion(self, region, newLavs, time, point):
+        # The new LAVs take the place of some of the region's, cut apart at point. Each counter clockwise
+        # one bounds a piece, the one that goes on with the outline of the region keeps the region, and
+        # only when there are pieces besides it are the clockwise LAVs placed, each in the piece around it
+        # LAVs with two vertices are about to close and own no area
+        pieces = [newLav for newLav in newLavs if newLav.winding > 0 and newLav.count > 2]
+        if pieces and not any(other.winding > 0 for other in region):
+            pieces.remove(max(pieces, key=lambda newLav: newLav.count))
+        for newLav in newLavs:
+            self.slav.addLav(newLav, set() if newLav in pieces else region)
+        holes = [lav for lav in region if lav.winding < 0 and lav.count > 2]
+        if not pieces or not holes:
+            return
+        tested = []
+        for piece in pieces:
+            points = StraightSkeleton.lavPoints(piece, time)
+            tested.append((piece, points, bounds(points)))
+        for hole in holes:
+            position = StraightSkeleton.awayFrom(hole, time, point)
+            owner = next((piece for piece, points, (minX, minY, maxX, maxY) in tested
+                          if minX <= position.x <= maxX and minY <= position.y <= maxY
+                          and contains(points, position)), None)
+            if owner is not None:
+                region.discard(hole)
+                owner.region.add(hole)
+                hole.region = owner.region
+
+    def awayFrom(lav, time, point):
+        # Position of a vertex of lav that is not at point, where the rings that touch there part
+        vertex = lav.head
+        while True:
+            position = StraightSkeleton.positionAt(vertex, time)
+            if not Point.same_point(position, point) or vertex.next is lav.head:
+                return position
+            vertex = vertex.next
+
+    def positionAt(vertex, time):
+        # Vertices that were not bisected yet were just created at time
+        if vertex.rayDirection is None:
+            return vertex.point
+        return vertex.positionAt(time)
+
+    def lavPoints(lav, time):
+        points = []
+        vertex = lav.head
+        while True:
+            points.append(StraightSkeleton.positionAt(vertex, time))
+            vertex = vertex.next
+            if vertex is lav.head:
                 break
+        return points
 
-    def cluster_by_collision(self, cluster_events):
+    def find_unprocessed_vertex(self):
+        # The SLAV keeps the worklist up to date, so the oldest entry is the answer
+        return next(iter(self.slav.unprocessed), None)
+    
+    def cluster_by_collision(self, cluster_events, eps=1e-6):
+        # An event joins the first cluster whose first collision is the same point,
+        # found through a hash of cells no smaller than the tolerance of same_point
+        if self.grid is not None:
+            return self.grid.cluster(cluster_events)
+        size = predicates.tolerance(eps, *(value for event in cluster_events
+                                           for value in (event.collision.x, event.collision.y)))
         clusters = []
+        cells = {}
         for event in cluster_events:
-            added = False
-            for cluster in clusters:
-                if cluster[0] is None:
-                    cluster.append(event)
-                    added = True
-                    break
-                elif Point.same_point(cluster[0].collision, event.collision):
-                    cluster.append(event)
-                    added = True
-                    break
-            if not added:
+            point = event.collision
+            cx, cy = math.floor(point.x / size), math.floor(point.y / size)
+            found = None
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for k in cells.get((cx + dx, cy + dy), ()):
+                        if (found is None or k < found) and Point.same_point(clusters[k][0].collision, point):
+                            found = k
+            if found is None:
+                cells.setdefault((cx, cy), []).append(len(clusters))
                 clusters.append([event])
+            else:
+                clusters[found].append(event)
         return clusters
         
 
-    def handle_cluster(self, cluster_events):
-        clusters = self.cluster_by_collision(cluster_events)
+    def eventNode(self, point, time, vertices=()):
+        # New node for an event, or the node a vertex of the event starts from if it is right there.
+        # Merging a node only with the one next to it keeps the graph a tree, snapping to any node close by does not
+        for vertex in vertices:
+            if Point.same_point(vertex.point, point):
+                return self.nodeOf(vertex)
+        return self.skeletonResult.add_vertice(point, time, snap=False)
 
-        involved_vertices = set()
+    def handle_cluster(self, events):
+        clusters = self.cluster_by_collision(events) if len(events) > 1 else [events]
         for cluster in clusters:
+            # Earlier clusters of the same batch may have consumed some vertices
+            valid = [event for event in cluster if event.isValid()]
+            self.stats.count("stale", len(cluster) - len(valid))
+            if valid:
+                self.handleEvents(valid)
+
+    def handleEvents(self, cluster, eps=1e-9):
+        """
+        Handles the events of a cluster, all at one point and time, as a
+        single event. Edge events bring their two vertices and split events
+        their reflex vertex and the LAV edge it hits, or the ends of that
+        edge that are right at the point. Neighbours that are at the point
+        too come along. A plain edge or split event goes through its own
+        handler, anything else through handleMultiEvent.
+        """
+        point = cluster[0].collision
+        time = cluster[0].time
+        vertices = {}
+        hits = {}
+        targets = {}
+        edges = []
+        for event in cluster:
+            if event.eventType == 'edge':
+                if self.shadowed(event):
+                    self.stats.count("stale")
+                    continue
+                edges.append(event)
+                vertices[event.vertexA] = None
+                vertices[event.vertexB] = None
+                continue
+            left = self.splitTarget(event, eps)
+            if left is None:
+                continue
+            targets[event] = left
+            vertices[event.vertexA] = None
+            # Two reflex vertices that run into each other head on make a vertex event
+            ends = [end for end in (left, left.next)
+                    if Point.same_point(StraightSkeleton.positionAt(end, time), point)]
+            for end in ends:
+                vertices[end] = None
+            if not ends:
+                hits[left] = None
+
+        for vertex in list(vertices):
+            for side in ('prev', 'next'):
+                neighbour = getattr(vertex, side)
+                while (neighbour not in vertices
+                       and Point.same_point(StraightSkeleton.positionAt(neighbour, time), point)):
+                    vertices[neighbour] = None
+                    neighbour = getattr(neighbour, side)
+        hits = [left for left in hits if left not in vertices and left.next not in vertices]
 
-            #add the collision point as a vertice in the skeleton graph
-            collision_point = cluster[0].collision
-            lav = cluster[0].vertexA.lav
-            newVertex = Vertex(collision_point)
-            newVertex.lav = lav
-            self.skeletonGraph.add_vertice(collision_point)
-
-            if lav.head.prev.prev == lav.head.next:
-                # This is a special case where the new vertex creates a peak of roof
-                vertexA = lav.head
-                vertexB = lav.head.next
-                vertexC = lav.head.prev
-
-                vertexA.processed = True
-                vertexB.processed = True
-                vertexC.processed = True
-
-                lav.remove_vertex(vertexA)
-                lav.remove_vertex(vertexB)
-                lav.remove_vertex(vertexC)
-
-                self.slav.removeLav(lav)
-
-                 # Update the skeleton graph
-                self.skeletonGraph.add_vertice(vertexA.point)
-                self.skeletonGraph.add_vertice(vertexB.point)
-                self.skeletonGraph.add_vertice(vertexC.point)
-                self.skeletonGraph.add_edge(Edge(vertexC.point, collision_point))
-                self.skeletonGraph.add_edge(Edge(vertexA.point, collision_point))
-                self.skeletonGraph.add_edge(Edge(vertexB.point, collision_point))
-                print(f"Processed peak of roof event: {cluster[0]}")
+        if not hits and len(vertices) == 2:
+            event = edges[0] if edges else None
+            if event is not None and event.vertexA.next is event.vertexB:
+                self.handleEdgeEvent(event)
+                self.stats.handled("edge", event)
+                vertices = {}
+        elif len(vertices) == 1 and len(hits) == 1:
+            event = next(event for event in targets if targets[event] is hits[0])
+            self.handleSplitEvent(event, hits[0])
+            vertices = {}
+        if vertices:
+            self.handleMultiEvent(cluster[0], list(vertices), hits)
+
+        for event in cluster:
+            vertex = event.vertexA
+            if event.eventType == 'split' and event not in targets and vertex.isAlive:
+                # The opposite edge is gone from there, look for the next one it may hit
+                self.pendingSplits.pop(vertex, None)
+                self.pendingEdges.pop(vertex, None)
+                self.pushSplitEvent(vertex, time - eps)
+                # Its LAV edges were placed up to that split only
+                for owner in (vertex.prev, vertex):
+                    self.placeEdge(owner, time - eps)
+
+    def shadowed(self, event):
+        # Between edges that face each other a vertex stays put and its ray is swept at once,
+        # so its edge events all come at the same time and only the one with the nearer neighbour holds
+        point = event.collision
+        for vertex, other in ((event.vertexA, event.vertexA.prev), (event.vertexB, event.vertexB.next)):
+            if Point.same_point(vertex.point, point):
                 continue
+            if not Point.same_point(StraightSkeleton.positionAt(vertex, event.time), vertex.point):
+                continue
+            position = StraightSkeleton.positionAt(other, event.time)
+            nearer, reached = position - vertex.point, point - vertex.point
+            if not Point.same_point(position, point) and nearer.dot(nearer) < reached.dot(reached):
+                return True
+        return False
+
+    def handleMultiEvent(self, event, vertices, hits):
+        # Pieces of the polygon apart from each other only meet there within the tolerance,
+        # each is resolved with a node of its own
+        byRegion = {}
+        for vertex in vertices:
+            byRegion.setdefault(id(vertex.lav.region), ([], []))[0].append(vertex)
+        for left in hits:
+            byRegion.setdefault(id(left.lav.region), ([], []))[1].append(left)
+        for regionVertices, regionHits in byRegion.values():
+            if regionVertices:
+                self.resolveAt(event, regionVertices, regionHits)
+        self.stats.handled("cluster", event)
+
+    def port(edge, vertex, outgoing, tolerance=1e-9):
+        # (angle, outgoing, vertex, edge) for the wavefront edge leaving the event point towards vertex
+        dx, dy = edge.end.x - edge.ini.x, edge.end.y - edge.ini.y
+        if not outgoing:
+            dx, dy = -dx, -dy
+        angle = math.atan2(dy + 0.0, dx + 0.0)
+        if angle > math.pi - tolerance:
+            angle -= 2 * math.pi
+        return angle, outgoing, vertex, edge
+
+    def resolveAt(self, event, vertices, hits, tolerance=1e-9):
+        """
+        Resolves vertices of one piece of the polygon that meet at the
+        collision of event, and the LAV edges of the piece hit there inside,
+        as one event. Every run of consecutive vertices that meet, and every
+        edge hit, leaves a wavefront edge coming in and one going out of the
+        point. Sorted by angle they alternate, and each edge going out pairs
+        with the next one coming in counter clockwise into a new vertex.
+        An edge going out and one coming in along the same line face each
+        other across a bit of no width, so the one going out sorts first.
+        The LAVs are relinked in one pass, with one LAV per ring.
+        """
+        point = event.collision
+        time = event.time
+        index = self.slav.edgeIndex
+        meeting = dict.fromkeys(vertices)
+        region = vertices[0].lav.region
+        node = self.eventNode(point, time, vertices + hits + [left.next for left in hits]
+                              + [vertex.prev for vertex in vertices] + [vertex.next for vertex in vertices])
+
+        chains = []
+        for vertex in vertices:
+            if vertex.prev not in meeting:
+                chain = [vertex]
+                while chain[-1].next in meeting:
+                    chain.append(chain[-1].next)
+                chains.append(chain)
+        ports = []
+        for chain in chains:
+            ports.append(StraightSkeleton.port(chain[0].edgeLeft, chain[0].prev, False))
+            ports.append(StraightSkeleton.port(chain[-1].edgeRight, chain[-1].next, True))
+        for left in hits:
+            ports.append(StraightSkeleton.port(left.edgeRight, left, False))
+            ports.append(StraightSkeleton.port(left.edgeRight, left.next, True))
+        ports.sort(key=lambda port: port[0])
+        groups = []
+        for port in ports:
+            if not groups or port[0] - groups[-1][0][0] >= tolerance:
+                groups.append([])
+            groups[-1].append(port)
+        ports = [port for group in groups for port in sorted(group, key=lambda port: not port[1])]
+
+        # Each edge going out takes the next edge coming in that is still free
+        taken = set()
+        newVertices = []
+        for i, (_, outgoing, following, outEdge) in enumerate(ports):
+            if not outgoing:
+                continue
+            j = (i + 1) % len(ports)
+            while ports[j][1] or j in taken:
+                j = (j + 1) % len(ports)
+            taken.add(j)
+            preceding, inEdge = ports[j][2], ports[j][3]
+            newVertex = Vertex(point, inEdge, outEdge)
+            newVertex.node = node
+            preceding.link(newVertex)
+            newVertex.link(following)
+            newVertices.append(newVertex)
+
+        # Number of vertices each old LAV keeps, the ones that meet leave the wavefront
+        oldLavs = {}
+        for left in hits:
+            oldLavs[left.lav] = left.lav.count
+        for vertex in vertices:
+            oldLavs[vertex.lav] = oldLavs.get(vertex.lav, vertex.lav.count) - 1
+        # Turns around each old LAV, 2 pi times its winding, less those of the vertices that leave
+        turnings = {lav: 2 * math.pi * lav.winding for lav in oldLavs}
+        for vertex in vertices:
+            turnings[vertex.lav] -= vertex.turn()
+        for vertex in vertices:
+            self.traceVertex(vertex, node, time)
+            vertex.lav.markProcessed(vertex)
+            index.remove(vertex)
+            self.slav.unprocessed.pop(vertex, None)
+            vertex.retire()
+        if not chains:
+            self.stats.handled("peak_of_roof", event)
+        for lav in oldLavs:
+            self.slav.removeLav(lav)
+            lav.count = 0
+        if not newVertices:
+            return []
+
+        # Stretches of old vertices from each new vertex to the next one, walked
+        # in step so that the longest one is never walked to the end, and their turns
+        isNew = dict.fromkeys(newVertices)
+        stretches = {}
+        turns = {}
+        walking = [[newVertex, newVertex.next, 1, newVertex.next.turn()] for newVertex in newVertices]
+        while len(walking) > 1:
+            still = []
+            for walk in walking:
+                following = walk[1].next
+                if following in isNew:
+                    stretches[walk[0]] = (following, walk[2], walk[1], walk[0].next.lav)
+                    turns[walk[0]] = walk[3]
+                    turnings[walk[0].next.lav] -= walk[3]
+                else:
+                    walk[1], walk[2], walk[3] = following, walk[2] + 1, walk[3] + following.turn()
+                    still.append(walk)
+            walking = still
+        unwalked = None
+        if walking:
+            unwalked = walking[0][0]
+            lav = unwalked.next.lav
+            ended = set(stretch[0] for stretch in stretches.values())
+            end = next(newVertex for newVertex in newVertices if newVertex not in ended)
+            size = oldLavs[lav] - sum(stretch[1] for stretch in stretches.values() if stretch[3] is lav)
+            stretches[unwalked] = (end, size, None, lav)
+            # The turns of the old LAV not walked are those of its last stretch
+            turns[unwalked] = turnings[lav]
+
+        rings = []
+        seen = set()
+        for start in newVertices:
+            ring = []
+            vertex = start
+            while vertex not in seen:
+                seen.add(vertex)
+                ring.append(vertex)
+                vertex = stretches[vertex][0]
+            if ring:
+                rings.append(ring)
 
-            for event in cluster:
-                involved_vertices.add(event.vertexA)
-                event.vertexA.next = newVertex
-                
-                if event.vertexB is not None:
-                    involved_vertices.add(event.vertexB)
-                    event.vertexB.prev = newVertex
-
-            for vertex in involved_vertices:
-
-                if vertex.next != newVertex:
-                    newVertex.next = vertex.next
-                    vertex.next.prev = newVertex
-                elif vertex.prev != newVertex:
-                    newVertex.prev = vertex.prev
-                    vertex.prev.next = newVertex
-
-                vertex.processed = True
-                self.skeletonGraph.add_vertice(vertex.point)
-                self.skeletonGraph.add_edge(Edge(vertex.point, newVertex.point))
-                
-                # Mark the old vertices as processed and remove them from the linked list
-                vertex.processed = True
-                vertex.isAlive = False
-                vertex.prev = None
-                vertex.next = None
-                vertex.lav.count -= 1
-                vertex.lav = None
-
-            if newVertex.lav.count > 1:
-                # Compute the bisecting ray for the new vertex
-                newVertex.bisecting()
-                newVertex.prev.bisecting()    
-                newVertex.next.bisecting()
-
-                # Schedule new events for the affected vertices
-                edgeEventA = StraightSkeleton.findEdgeEvent(newVertex.prev, newVertex)
-                edgeEventB = StraightSkeleton.findEdgeEvent(newVertex, newVertex.next)
-
-                if edgeEventA is not None:
-                    heapq.heappush(self.eventQueue, edgeEventA)
-                if edgeEventB is not None:
-                    heapq.heappush(self.eventQueue, edgeEventB)
+        # An old LAV goes on with the ring that has most of its vertices, the stretch
+        # not walked to the end keeps its own, the vertices of the others are claimed
+        shares = {}
+        for k, ring in enumerate(rings):
+            for newVertex in ring:
+                key = (k, stretches[newVertex][3])
+                shares[key] = shares.get(key, 0) + stretches[newVertex][1]
+        first = next(((k, stretches[unwalked][3]) for k, ring in enumerate(rings) if unwalked in ring), None)
+        kept = {}
+        for k, lav in sorted(shares, key=lambda key: (key != first, -shares[key])):
+            if k not in kept and lav not in kept.values():
+                kept[k] = lav
+        newLavs = []
+        for k, ring in enumerate(rings):
+            lav = kept.get(k)
+            if lav is None:
+                lav = Lav(ring[0], index, self.slav.unprocessed)
+            lav.count = len(ring) + sum(stretches[newVertex][1] for newVertex in ring)
+            lav.winding = StraightSkeleton.windingOf(sum(newVertex.turn() + turns[newVertex] for newVertex in ring))
+            for newVertex in ring:
+                lav.claim(newVertex, newVertex)
+                _, _, last, owner = stretches[newVertex]
+                if owner is not lav:
+                    lav.claim(newVertex.next, last)
+            newLavs.append(lav)
+        for lav, ring in zip(newLavs, rings):
+            if not lav.head.isAlive or lav.head.lav is not lav:
+                lav.head = ring[0]
+                lav.head.first = True
+
+        if len(newLavs) == 1:
+            self.slav.addLav(newLavs[0], region)
+        else:
+            self.splitRegion(region, newLavs, time, point)
+
+        for newVertex in newVertices:
+            index.update(newVertex.prev)
+            index.update(newVertex)
+        alive = []
+        for lav, ring in zip(newLavs, rings):
+            if lav.count <= 2:
+                self.closeLav(lav, time)
             else:
-                self.slav.removeLav(lav)
+                alive.extend(ring)
+        for newVertex in alive:
+            newVertex.bisecting()
+            newVertex.prev.bisecting()
+            newVertex.next.bisecting()
+        for newVertex in alive:
+            self.pushEvents(newVertex)
+        return alive
 
-            
-            #prepare for the next cluster
-            involved_vertices.clear()
+    def nodeOf(self, vertex):
+        # Skeleton node the vertex starts from, found by position for the input vertices
+        if vertex.node is None:
+            vertex.node = self.skeletonResult.add_vertice(vertex.point, vertex.creationTime())
+        return vertex.node
 
-        return newVertex
+    def traceVertex(self, vertex, collision, time):
+        # Arc left by the vertex up to the collision node, and its lifetime on the wavefront
+        self.skeletonResult.add_arc(self.nodeOf(vertex), collision)
+        if self.wavefront is not None:
+            self.wavefront.add(vertex, time)
+
+    def closeLav(self, lav, time):
+        # A LAV reduced to two vertices is finished by the arc that joins them
+        vertexA = lav.head
+        vertexB = vertexA.next
+        if vertexB is not vertexA:
+            self.skeletonResult.add_arc(self.nodeOf(vertexA), self.nodeOf(vertexB))
+        if self.wavefront is not None:
+            self.wavefront.add(vertexA, time)
+            if vertexB is not vertexA:
+                self.wavefront.add(vertexB, time)
+        lav.markProcessed(vertexA)
+        lav.markProcessed(vertexB)
+        self.retireLav(lav)
+
+    def retireLav(self, lav):
+        vertex = lav.head
+        while vertex is not None and vertex.isAlive:
+            following = vertex.next
+            self.slav.edgeIndex.remove(vertex)
+            self.slav.unprocessed.pop(vertex, None)
+            vertex.retire()
+            vertex = following
+        lav.count = 0
+        self.slav.removeLav(lav)
+
+    def offset(self, distance):
+        # Rings of the wavefront at distance from the outline, after run()
+        if self.wavefront is None:
+            raise ValueError("a streamed run keeps no wavefront, use run() for offsets")
+        return self.wavefront.offset(distance)
+
+    def offsets(self, distances):
+        # Same as offset for every distance of the list, in one sweep
+        if self.wavefront is None:
+            raise ValueError("a streamed run keeps no wavefront, use run() for offsets")
+        return self.wavefront.offsets(distances)
+
+    @property
+    def skeletonGraph(self):
+        # Set based graph built from the arrays, kept for older callers
+        return self.skeletonResult.toGraph()
 
-                
-    def buildFirstLAV(self, polygon_points):
+    def buildFirstLAV(self, polygon_points, region=None, winding=1):
         init_vertex = build_polygon(polygon_points)
-        lav = Lav(init_vertex)
-        self.slav.addLav(lav)
+        lav = Lav(init_vertex, self.slav.edgeIndex, self.slav.unprocessed)
+        lav.winding = winding
+        self.slav.addLav(lav, region)
         vertex = lav.head
         while True:
             vertex = vertex.next
             vertex.bisecting()
             vertex.lav = lav
             lav.count += 1
+            lav.track(vertex)
+            self.slav.edgeIndex.insert(vertex)
             if vertex.first:
                 break
 
 
+    def buildFirstLAVArrays(self, polygon_points, arrays, region=None, winding=1):
+        init_vertex = build_polygon(polygon_points)
+        lav = Lav(init_vertex, self.slav.edgeIndex, self.slav.unprocessed)
+        lav.winding = winding
+        self.slav.addLav(lav, region)
+        vertices = []
+        vertex = init_vertex
+        for i in range(arrays.n):
+            bisector = arrays.rawBisectors[i]
+            vertex._isReflex = bool(arrays.reflex[i])
+            vertex.rayDirection = Ray(vertex.point, Point(float(bisector[0]), float(bisector[1])))
+            vertex.lav = lav
+            lav.count += 1
+            lav.track(vertex)
+            self.slav.edgeIndex.insert(vertex)
+            vertices.append(vertex)
+            vertex = vertex.next
+        return vertices
+
+    def inicializeEventQueueArrays(self, built):
+        # built: (vertices, arrays) of every contour, the whole index must be ready
+        events = []
+        sweeps = []
+        for vertices, arrays in built:
+            valid, collisions, times = arrays.edgeEvents()
+            sweeps.append((arrays, valid, times))
+            n = len(vertices)
+            for i in range(n):
+                vertex = vertices[i]
+                following = vertices[(i + 1) % n]
+                if valid[i]:
+                    point = Point(float(collisions[i, 0]), float(collisions[i, 1]))
+                    events.append(Event(point, float(times[i]), 'edge', vertex, following))
+                    self.edgeTimes[vertex] = (following, float(times[i]))
+                else:
+                    self.edgeTimes[vertex] = (following, math.inf)
+        # Edge events first, simultaneous events are handled in the order they are queued
+        self.eventQueue.extend(events)
+        self.seedSplitEvents([vertices for vertices, _ in built], sweeps)
+
     def inicializeEventQueue(self):
+        events = []
+        contours = []
         for lav in self.slav.lavs:
+            vertices = []
             vertex = lav.head
             while True:
                 event = StraightSkeleton.findEdgeEvent(vertex, vertex.next)
                 if event is not None:
-                    heapq.heappush(self.eventQueue, event)
+                    events.append(event)
+                self.edgeTimes[vertex] = (vertex.next, event.time if event is not None else math.inf)
+                vertices.append(vertex)
                 vertex = vertex.next
                 if vertex.first:
                     break
-    
-    def run(self):
-        while self.eventQueue:
-            event = heapq.heappop(self.eventQueue)
-            if not event.isValid():
-                continue
+            contours.append(vertices)
+        self.eventQueue.extend(events)
+        self.seedSplitEvents(contours)
 
-            cluster_events = [event]
-            if self.eventQueue:
-                if self.eventQueue[0].isSimultaneous(event):
-                    self.find_simultaneous_events(cluster_events)
-                else:
-                    cluster_events.remove(event)
+    def seedSplitEvents(self, contours, sweeps=None):
+        # The rays go in first, as far as they may go, so the LAV edges see how crowded
+        # their cells are. The edges then find the splits, queued in the order of the
+        # reflex vertices as simultaneous events are handled in the order they are queued.
+        # sweeps has the LavArrays and edge events of every contour, to find what the edges sweep at once
+        reflex = [vertex for vertices in contours for vertex in vertices if vertex._isReflex]
+        if not reflex:
+            return
+        self.edgesPlaced = True
+        for vertex in reflex:
+            limit = min(self.edgeTime(vertex.prev), self.edgeTime(vertex), self.maxTime)
+            self.splitLimits[vertex] = limit
+            self.placeRay(vertex, 0, limit)
+        index = self.slav.edgeIndex
+        swept = {}
+        if sweeps is not None:
+            for vertices, (arrays, valid, times) in zip(contours, sweeps):
+                swept.update(zip(vertices, zip(*arrays.sweeps(valid, times, self.maxTime, index))))
+        self.seeded = {}
+        for vertices in contours:
+            for vertex in vertices:
+                self.placeEdge(vertex, 0, swept.get(vertex))
+        seeded, self.seeded = self.seeded, None
+        for vertex in reflex:
+            if vertex in seeded:
+                self.eventQueue.push(seeded[vertex])
 
-            if cluster_events:
-                self.handle_cluster(cluster_events)
+    def step(self):
+        # Handles the next batch of simultaneous events, False once the queue is empty.
+        # The LAV edges and rays cut short go on first once no event is left before they end
+        while self.replacements and (not self.eventQueue or
+                                     self.eventQueue.key(self.replacements[0][0]) < self.eventQueue.heap[0][0]):
+            self.placeAgain(*heapq.heappop(self.replacements))
+        if not self.eventQueue:
+            return False
+        events = self.eventQueue.popSimultaneous()
+        if len(events) > 1:
+            self.stats.count("clustered", len(events))
+        self.handle_cluster(events)
 
-            elif event.eventType == 'edge':
-                self.handleEdgeEvent(event)
-                print(f"Processed edge event: {event}")
+        if self.eventQueue.wantsCompaction():
+            self.compact()
+        return True
+
+    def placeAgain(self, time, order, kind, vertex):
+        # Entries of vertices placed again since, or gone, are stale
+        if not vertex.isAlive:
+            return
+        if kind == 'edge' and self.edgeUntil.get(vertex) == time:
+            self.placeEdge(vertex, time)
+        elif kind == 'ray' and self.rayUntil.get(vertex) == time:
+            self.pushSplitEvent(vertex, time)
+
+    def compact(self):
+        # Stale events and the split bookkeeping are the last references to retired vertices
+        self.eventQueue.compact()
+        for table in (self.edgeTimes, self.splitLimits, self.pendingSplits, self.pendingEdges, self.edgeWindows,
+                      self.rayWindows, self.edgeUntil, self.rayUntil, self.rayClocks):
+            for vertex in [vertex for vertex in table if not vertex.isAlive]:
+                del table[vertex]
+        self.replacements = [entry for entry in self.replacements if entry[3].isAlive]
+        heapq.heapify(self.replacements)
 
-            elif event.eventType == 'split':
-                self.handleSplitEvent(event)
+    def closeLeftovers(self):
+        # LAVs no event closed are left within the tolerance of a point, each meets at its centre
+        for lav in list(self.slav.lavs):
+            vertices = []
+            vertex = lav.head
+            while True:
+                vertices.append(vertex)
+                vertex = vertex.next
+                if vertex is lav.head:
+                    break
+            time = max(vertex.creationTime() for vertex in vertices)
+            centre = Point(sum(vertex.point.x for vertex in vertices) / len(vertices),
+                           sum(vertex.point.y for vertex in vertices) / len(vertices))
+            node = self.skeletonResult.add_vertice(centre, time, snap=False)
+            for vertex in vertices:
+                lav.markProcessed(vertex)
+                self.traceVertex(vertex, node, time)
+            self.retireLav(lav)
 
         leftover_vertex = self.find_unprocessed_vertex()
         while leftover_vertex is not None:
-            self.skeletonGraph.add_vertice(leftover_vertex.point)
-            self.skeletonGraph.add_edge(Edge(leftover_vertex.point, leftover_vertex.prev.point))
-            self.skeletonGraph.add_edge(Edge(leftover_vertex.point, leftover_vertex.next.point))
-            leftover_vertex.processed = True
+            result = self.skeletonResult
+            leftover = self.nodeOf(leftover_vertex)
+            result.add_arc(leftover, self.nodeOf(leftover_vertex.prev))
+            result.add_arc(leftover, self.nodeOf(leftover_vertex.next))
+            leftover_vertex.lav.markProcessed(leftover_vertex)
             leftover_vertex = self.find_unprocessed_vertex()
 
+    def finish(self):
+        # Calls of the filtered predicates made for this skeleton, and how many went exact
+        for name, value in predicates.counters.items():
+            self.stats.count("predicate_" + name, value - self.predicateCounters[name])
+        for name, value in bisectorCounters.items():
+            self.stats.count(name, value - self.bisectorCounters[name])
+        self.stats.report()
+
+    def run(self):
+        with self.stats.phase("event_loop"):
+            while self.step():
+                pass
+
+        with self.stats.phase("leftover"):
+            self.closeLeftovers()
+
+        self.finish()
+
+    def stream(self):
+        """
+        Runs like run(), but yields every arc as ((x0, y0, t0), (x1, y1, t1))
+        right after the events that made it. Nothing is kept: skeletonResult
+        only holds the arcs not consumed yet and no wavefront timeline is
+        recorded, so offsets are not available afterwards. The phases take
+        in the time the caller spends on the arcs yielded in them.
+        """
+        arcs = ArcStream()
+        self.skeletonResult = arcs
+        self.wavefront = None
+        with self.stats.phase("event_loop"):
+            while self.step():
+                yield from arcs.drain()
+
+        with self.stats.phase("leftover"):
+            self.closeLeftovers()
+            yield from arcs.drain()
+
+        self.finish()
+
 
 if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
     fig1, ax = plt.subplots(figsize=(6, 5))
     fig2, b = plt.subplots(figsize=(6, 5))
     fig3, a = plt.subplots(figsize=(6, 5))
@@ -319,7 +1332,8 @@ if __name__ == "__main__":
 
     
     skeleton = StraightSkeleton(points)
-    skeleton.slav.lavs[0].draw(b)
+    for lav in skeleton.slav:
+        lav.draw(b)
 
     
     skeleton.run()
@@ -0,0 +1,101 @@
+import sys
+
+class SvgWriter:
+    """
+    Streams SVG elements to a file without matplotlib. The bounds are given
+    up front as (minX, minY, maxX, maxY) so the header can be written
+    first; y grows upwards like in the plots.
+    """
+    def __init__(self, path, bounds, width=800, margin=0.05):
+        minX, minY, maxX, maxY = bounds
+        spanX = max(maxX - minX, 1e-12)
+        spanY = max(maxY - minY, 1e-12)
+        pad = margin * max(spanX, spanY)
+        self.minX = minX - pad
+        self.maxY = maxY + pad
+        viewWidth = spanX + 2 * pad
+        viewHeight = spanY + 2 * pad
+        height = width * viewHeight / viewWidth
+
+        self.file = open(path, 'w')
+        self.file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self.file.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" height="{height:.0f}" '
+                        f'viewBox="0 0 {viewWidth:.6f} {viewHeight:.6f}">\n')
+        self.file.write('<g fill="none" stroke-linecap="round">\n')
+
+    def _x(self, x):
+        return f"{x - self.minX:.6f}"
+
+    def _y(self, y):
+        return f"{self.maxY - y:.6f}"
+
+    def segment(self, ini, end, color='black', width=1.0):
+        self.file.write(f'<line x1="{self._x(ini.x)}" y1="{self._y(ini.y)}" x2="{self._x(end.x)}" y2="{self._y(end.y)}" '
+                        f'stroke="{color}" stroke-width="{width}" vector-effect="non-scaling-stroke"/>\n')
+
+    def segments(self, segments, color='black', width=1.0):
+        # One path for many segments, segments as ((x0, y0), (x1, y1))
+        self.file.write(f'<path stroke="{color}" stroke-width="{width}" vector-effect="non-scaling-stroke" d="')
+        for (x0, y0), (x1, y1) in segments:
+            self.file.write(f'M{self._x(x0)} {self._y(y0)}L{self._x(x1)} {self._y(y1)}')
+        self.file.write('"/>\n')
+
+    def polygon(self, points, color='black', width=1.0):
+        coords = " ".join(f"{self._x(p.x)},{self._y(p.y)}" for p in points)
+        self.file.write(f'<polygon points="{coords}" stroke="{color}" stroke-width="{width}" '
+                        f'vector-effect="non-scaling-stroke"/>\n')
+
+    def point(self, point, color='black', radius=2.0):
+        # radius in pixels, drawn as a zero length line with a round cap
+        self.file.write(f'<line x1="{self._x(point.x)}" y1="{self._y(point.y)}" x2="{self._x(point.x)}" '
+                        f'y2="{self._y(point.y)}" stroke="{color}" stroke-width="{2 * radius}" '
+                        f'vector-effect="non-scaling-stroke"/>\n')
+
+    def circle(self, center, radius, color='black', width=1.0, dashed=False):
+        dash = ' stroke-dasharray="4 3"' if dashed else ''
+        self.file.write(f'<circle cx="{self._x(center.x)}" cy="{self._y(center.y)}" r="{radius:.6f}" '
+                        f'stroke="{color}" stroke-width="{width}" vector-effect="non-scaling-stroke"{dash}/>\n')
+
+    def close(self):
+        if not self.file.closed:
+            self.file.write('</g>\n</svg>\n')
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def polygon_bounds(points):
+    xs = [p.x for p in points]
+    ys = [p.y for p in points]
+    return min(xs), min(ys), max(xs), max(ys)
+
+def write_skeleton_svg(path, points, skeletonResult, holes=(), colorPolygon='black', colorSkeleton='red'):
+    # Outline, holes and skeleton arcs of a SkeletonArrays result
+    with SvgWriter(path, polygon_bounds(points)) as svg:
+        svg.polygon(points, colorPolygon)
+        for hole in holes:
+            svg.polygon(hole, colorPolygon)
+        xs, ys = skeletonResult.xs, skeletonResult.ys
+        svg.segments((((xs[a], ys[a]), (xs[b], ys[b])) for a, b in skeletonResult.arcs), colorSkeleton)
+
+def write_circles_svg(path, points, circles, colorPolygon='black', colorCircles='green'):
+    # Crease pattern debug image: the outline and a circle packing
+    with SvgWriter(path, polygon_bounds(points)) as svg:
+        svg.polygon(points, colorPolygon)
+        for c in circles:
+            svg.circle(c.center, c.radius, colorCircles)
+
+if __name__ == "__main__":
+    from straightSkeleton import StraightSkeleton, load_json
+    if len(sys.argv) != 4:
+        print("usage: python svgWriter.py polygons.json polygon_name output.svg")
+        sys.exit(1)
+    points, holes = load_json(sys.argv[1], sys.argv[2], withHoles=True)
+    skeleton = StraightSkeleton(points, holes)
+    skeleton.run()
+    write_skeleton_svg(sys.argv[3], points, skeleton.skeletonResult, holes)
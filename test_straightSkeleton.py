@@ -0,0 +1,437 @@
+import math
+import pytest
+import random
+from straightSkeleton import *
+from polygonGenerators import *
+
+def simply_connected(shape):
+    # No two cells touch at a corner only and every empty cell is reachable from outside
+    if any((x + 1, y + dy) in shape and (x + 1, y) not in shape and (x, y + dy) not in shape
+           for x, y in shape for dy in (1, -1)):
+        return False
+    xs, ys = [x for x, _ in shape], [y for _, y in shape]
+    box = {(x, y) for x in range(min(xs) - 1, max(xs) + 2) for y in range(min(ys) - 1, max(ys) + 2)}
+    outside = {(min(xs) - 1, min(ys) - 1)}
+    stack = list(outside)
+    while stack:
+        x, y = stack.pop()
+        for cell in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if cell in box and cell not in shape and cell not in outside:
+                outside.add(cell)
+                stack.append(cell)
+    return len(outside) + len(shape) == len(box)
+
+def polyomino(cells, seed):
+    # Random simply connected union of unit squares, counter clockwise without collinear corners
+    rng = random.Random(seed)
+    shape = {(0, 0)}
+    while len(shape) < cells:
+        x, y = rng.choice(sorted(shape))
+        dx, dy = rng.choice(((1, 0), (-1, 0), (0, 1), (0, -1)))
+        if (x + dx, y + dy) not in shape and simply_connected(shape | {(x + dx, y + dy)}):
+            shape.add((x + dx, y + dy))
+    following = {}
+    for x, y in shape:
+        if (x, y - 1) not in shape:
+            following[(x, y)] = (x + 1, y)
+        if (x + 1, y) not in shape:
+            following[(x + 1, y)] = (x + 1, y + 1)
+        if (x, y + 1) not in shape:
+            following[(x + 1, y + 1)] = (x, y + 1)
+        if (x - 1, y) not in shape:
+            following[(x, y + 1)] = (x, y)
+    ring = [min(following)]
+    while following[ring[-1]] != ring[0]:
+        ring.append(following[ring[-1]])
+    return [Point(float(b[0]), float(b[1])) for a, b, c in zip(ring[-1:] + ring[:-1], ring, ring[1:] + ring[:1])
+            if (b[0] - a[0]) * (c[1] - b[1]) != (b[1] - a[1]) * (c[0] - b[0])]
+
+def misplaced_nodes(points, nodes, times, eps=1e-7):
+    # Nodes swept later than their distance to the boundary, or inner nodes at no edge line their time away
+    import numpy as np
+    starts = np.array([(p.x, p.y) for p in points])
+    sides = np.roll(starts, -1, axis=0) - starts
+    lengths = (sides ** 2).sum(1)
+    misplaced = []
+    for first in range(0, len(nodes), 256):
+        block = np.array(nodes[first:first + 256]).reshape(-1, 2)
+        time = np.array(times[first:first + 256])
+        offsets = block[:, None, :] - starts[None]
+        t = np.clip((offsets * sides).sum(2) / lengths, 0, 1)
+        distance = np.hypot(*np.moveaxis(offsets - t[..., None] * sides, 2, 0)).min(1)
+        lines = np.abs(sides[:, 0] * offsets[..., 1] - sides[:, 1] * offsets[..., 0]) / np.sqrt(lengths)
+        bad = (time > distance + eps) | ((time > 0) & (np.abs(lines - time[:, None]).min(1) > eps))
+        misplaced += [(*nodes[first + i], times[first + i], float(distance[i])) for i in np.flatnonzero(bad)]
+    return misplaced
+
+def skeleton_of(points, holes=()):
+    skeleton = StraightSkeleton(points, holes)
+    skeleton.run()
+    result = skeleton.skeletonResult
+    return list(zip(result.xs, result.ys)), list(result.arcs)
+
+def cycles_and_components(nodes, arcs):
+    parent = list(range(len(nodes)))
+
+    def find(a):
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        return a
+
+    cycles = 0
+    for a, b in arcs:
+        ra, rb = find(a), find(b)
+        if ra == rb:
+            cycles += 1
+        else:
+            parent[ra] = rb
+    return cycles, len({find(i) for i in range(len(nodes))})
+
+def crossing_arcs(nodes, arcs, eps=1e-9):
+    # Pairs of arcs without a common node that properly cross each other
+    def side(p, q, r):
+        value = (q[0] - p[0]) * (r[1] - p[1]) - (q[1] - p[1]) * (r[0] - p[0])
+        return 0 if abs(value) <= eps else (1 if value > 0 else -1)
+
+    crossings = []
+    for i in range(len(arcs)):
+        for j in range(i + 1, len(arcs)):
+            if len({*arcs[i], *arcs[j]}) < 4:
+                continue
+            a, b = nodes[arcs[i][0]], nodes[arcs[i][1]]
+            c, d = nodes[arcs[j][0]], nodes[arcs[j][1]]
+            if side(a, b, c) * side(a, b, d) < 0 and side(c, d, a) * side(c, d, b) < 0:
+                crossings.append((arcs[i], arcs[j]))
+    return crossings
+
+def test_random_stars_give_a_tree():
+    for seed in range(20):
+        nodes, arcs = skeleton_of(random_star(40, seed))
+        assert cycles_and_components(nodes, arcs) == (0, 1), seed
+        assert crossing_arcs(nodes, arcs) == [], seed
+    # Long spikes, a missed or late split leaves a node too deep or a vertex short
+    points = random_star(1200, 53)
+    skeleton = StraightSkeleton(points)
+    skeleton.run()
+    result = skeleton.skeletonResult
+    nodes = list(zip(result.xs, result.ys))
+    assert len(nodes) == 2 * len(points) - 2
+    assert cycles_and_components(nodes, list(result.arcs)) == (0, 1)
+    assert misplaced_nodes(points, nodes, result.nodeTimes) == []
+
+def test_split_search_grows_slower_than_the_square():
+    # Reflex vertices pair with the LAV edges placed over the same cells at the same time,
+    # a quadratic search pairs every one with a share of all of them. The base of a comb
+    # is cut by every valley at the same time, and what is left of it each time is long
+    for generator in (random_star, comb_polygon):
+        counters = []
+        for n in (250, 1000):
+            stats = Instrumentation()
+            skeleton = StraightSkeleton(generator(n, 0), instrumentation=stats)
+            skeleton.run()
+            if generator is random_star:
+                assert len(skeleton.skeletonResult.nodeTimes) == 2 * n - 2
+            assert stats.counters["split_candidates"] <= 8 * n, (generator.__name__, n)
+            counters.append(stats.counters["split_pairs"])
+        assert counters[1] < 12 * counters[0], generator.__name__
+
+def test_holes_add_one_cycle_each():
+    outline = random_star(24, 7)
+    holes = [[Point(x + 0.4 * math.cos(a), y + 0.4 * math.sin(a)) for a in (0, 2.1, 4.2)][::-1]
+             for x, y in ((-1.0, 0.0), (1.0, 0.5))]
+    nodes, arcs = skeleton_of(outline, holes)
+    assert cycles_and_components(nodes, arcs) == (2, 1)
+    assert crossing_arcs(nodes, arcs) == []
+
+def test_random_holes_add_one_cycle_each():
+    # Holes close together pinch pockets off the wavefront around them, and every piece keeps the holes it encloses
+    cases = [triangle_holes_polygon(20, 6, seed) for seed in range(60, 100)]
+    cases += [holes_polygon(50, seed) for seed in range(3)]
+    for outline, holes in cases:
+        nodes, arcs = skeleton_of(outline, holes)
+        assert cycles_and_components(nodes, arcs) == (len(holes), 1)
+        assert crossing_arcs(nodes, arcs) == []
+
+def test_regular_polygons_give_a_tree():
+    for n in (8, 100, 400, 1000):
+        for seed in range(3):
+            nodes, arcs = skeleton_of(regular_polygon(n, seed))
+            assert cycles_and_components(nodes, arcs) == (0, 1), (n, seed)
+    nodes, arcs = skeleton_of(regular_polygon(100, 0))
+    assert crossing_arcs(nodes, arcs) == []
+
+def test_cleanup_finds_crossing_edges():
+    from polygonCleanup import find_intersections, _coords
+    for seed in range(10):
+        points = random_star(200, seed)
+        assert find_intersections([_coords(points)]) == [], seed
+        # Vertices swapped across the star pull their edges through the others
+        points[10], points[110] = points[110], points[10]
+        assert find_intersections([_coords(points)]), seed
+
+def test_power_vertices_of_degenerate_circles():
+    from foldAndCut import power_diagram_vertices
+    circles = [Disc(Point(x, y), 1.0) for x, y in ((0, 0), (4, 0), (2, 3))]
+    [(vertex, triple)] = power_diagram_vertices(circles)
+    assert triple == (0, 1, 2) and abs(vertex.x - 2.0) < 1e-12 and abs(vertex.y - 5 / 6) < 1e-12
+    # Equal circles on a common circle lift to coplanar points
+    circles = [Disc(Point(x, y), 0.5) for x, y in ((1, 0), (0, 1), (-1, 0), (0, -1))]
+    vertices = power_diagram_vertices(circles)
+    assert len(vertices) == 2
+    assert all(abs(vertex.x) < 1e-12 and abs(vertex.y) < 1e-12 for vertex, _ in vertices)
+
+def test_circle_pairs_split_crossing_from_tangent_and_nested():
+    from foldAndCut import circle_pairs
+    circles = [Disc(Point(0, 0), 3.0), Disc(Point(1, 0), 1.0), Disc(Point(1, 0), 2.0),
+               Disc(Point(-6, 0), 3.0), Disc(Point(0, 3.5), 1.0)]
+    intersecting, tangent = circle_pairs(circles)
+    # 1 lies inside 0 and 2 without touching, 2 touches 0 from inside, 3 from outside
+    assert intersecting == [(0, 4)]
+    assert sorted(tangent) == [(0, 2), (0, 3)]
+
+def test_vectorized_setup_matches_within_rounding():
+    for seed in range(5):
+        points = random_star(60, seed)
+        plain, vectorized = StraightSkeleton(points), StraightSkeleton(points, vectorized=True)
+        events = [sorted((event.eventType, event.time, event.collision.x, event.collision.y)
+                         for _, _, event in skeleton.eventQueue.heap) for skeleton in (plain, vectorized)]
+        assert [event[0] for event in events[0]] == [event[0] for event in events[1]], seed
+        for a, b in zip(*events):
+            assert all(math.isclose(x, y, rel_tol=1e-12, abs_tol=1e-12) for x, y in zip(a[1:], b[1:])), seed
+        # The cells the LAV edges sweep, found at once from the arrays
+        placed = [{vertex.point: keys for vertex, keys in skeleton.slav.edgeIndex.edgeKeys.items()}
+                  for skeleton in (plain, vectorized)]
+        assert placed[0] == placed[1], seed
+        plain.run()
+        vectorized.run()
+        assert list(plain.skeletonResult.arcs) == list(vectorized.skeletonResult.arcs), seed
+        for x, y in ((plain.skeletonResult.xs, vectorized.skeletonResult.xs),
+                     (plain.skeletonResult.ys, vectorized.skeletonResult.ys)):
+            assert all(math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9) for a, b in zip(x, y)), seed
+
+def test_convex_polygons_place_no_edges():
+    # Without a reflex vertex no ray ever looks for the LAV edges
+    for vectorized in (False, True):
+        skeleton = StraightSkeleton(regular_polygon(50, 0, jitter=0), vectorized=vectorized)
+        assert skeleton.slav.edgeIndex.edgeKeys == {}
+        skeleton.run()
+        result = skeleton.skeletonResult
+        assert cycles_and_components(list(zip(result.xs, result.ys)), list(result.arcs)) == (0, 1)
+
+def test_rectilinear_nodes_are_no_deeper_than_the_boundary():
+    # Reflex vertices of polyominoes run into each other head on and many events share a point
+    for seed in range(40):
+        points = polyomino(30, seed)
+        skeleton = StraightSkeleton(points)
+        skeleton.run()
+        result = skeleton.skeletonResult
+        nodes = list(zip(result.xs, result.ys))
+        assert misplaced_nodes(points, nodes, result.nodeTimes) == [], seed
+        assert cycles_and_components(nodes, list(result.arcs)) == (0, 1), seed
+
+def test_split_and_edge_events_at_one_point_make_one_node():
+    # A polyomino with two corners cut at 45 degrees, a reflex vertex reaches the point
+    # where the cut meets the wavefront at the same time as the two edge events there
+    points = [Point(x, y) for x, y in ((-1, 0), (-0.5, 0), (0, -0.5), (0, -1), (2, -1), (2, -0.5),
+                                       (1, 0.5), (1, 1), (-0.5, 1), (-1, 0.5))]
+    skeleton = StraightSkeleton(points)
+    skeleton.run()
+    result = skeleton.skeletonResult
+    nodes = list(zip(result.xs, result.ys))
+    assert sum(1 for x, y in nodes if abs(x - (math.sqrt(0.5) - 1)) < 1e-9 and abs(y - 0.5) < 1e-9) == 1
+    assert misplaced_nodes(points, nodes, result.nodeTimes) == []
+    assert cycles_and_components(nodes, list(result.arcs)) == (0, 1)
+
+def same_nodes(a, b, eps=1e-7):
+    # Both node lists hold the same points, in any order
+    a, b = sorted(a), sorted(b)
+    return len(a) == len(b) and all(abs(p[0] - q[0]) < eps and abs(p[1] - q[1]) < eps for p, q in zip(a, b))
+
+def test_cache_hits_rotated_and_translated_copies(tmp_path):
+    from resultCache import ResultCache
+    cache = ResultCache(str(tmp_path), quantum=1e-6)
+    points = [Point(round(p.x, 3), round(p.y, 3)) for p in random_star(30, 4)]
+    cache.skeleton(points)
+    for copy in (points[7:] + points[:7], [Point(p.x + 2.5, p.y - 1.25) for p in points]):
+        hits = cache.stats["hits"]
+        result = cache.skeleton(copy)
+        assert cache.stats["hits"] == hits + 1
+        fresh, _ = skeleton_of(copy)
+        assert same_nodes(list(zip(result.xs, result.ys)), fresh)
+    assert cache.stats["stores"] == 1
+
+def test_cache_maps_power_triples_back_to_input_order(tmp_path):
+    from resultCache import ResultCache
+    from foldAndCut import power_diagram_vertices
+    rng = random.Random(2)
+    circles = [Disc(Point(rng.uniform(0, 10), rng.uniform(0, 10)), rng.uniform(0.1, 1.0)) for _ in range(30)]
+    cache = ResultCache(str(tmp_path))
+    cache.powerDiagram(circles)
+    permuted = circles[:]
+    rng.shuffle(permuted)
+    hits = cache.stats["hits"]
+    cached = cache.powerDiagram(permuted)
+    assert cache.stats["hits"] == hits + 1
+    expected = {triple: vertex for vertex, triple in power_diagram_vertices(permuted)}
+    assert len(cached) == len(expected)
+    for vertex, triple in cached:
+        assert abs(vertex.x - expected[triple].x) < 1e-9 and abs(vertex.y - expected[triple].y) < 1e-9
+
+def test_cache_evicts_the_least_recently_used_entry(tmp_path):
+    import os
+    from resultCache import ResultCache
+    cache = ResultCache(str(tmp_path))
+    polygons = [random_star(30, seed) for seed in range(3)]
+    for points in polygons[:2]:
+        cache.skeleton(points)
+    # The first entry is the older one, until it is read again
+    paths = [cache._file(cache.polygonKey(points)[0]) for points in polygons]
+    for age, path in enumerate(paths[:2]):
+        os.utime(path, (1000 + age, 1000 + age))
+    cache.skeleton(polygons[0])
+    cache.maxBytes = cache.size * 5 // 4
+    cache.skeleton(polygons[2])
+    assert cache.stats["evictions"] == 1
+    assert [os.path.exists(path) for path in paths] == [True, False, True]
+    assert cache.size <= cache.maxBytes
+
+def offset_area(rings):
+    # Counter clockwise rings count positive, the ones around holes negative
+    return sum(signed_area(ring) for ring in rings)
+
+def offset_perimeter(rings):
+    return sum(math.dist((a.x, a.y), (b.x, b.y)) for ring in rings for a, b in zip(ring, ring[1:] + ring[:1]))
+
+def canonical_rings(rings):
+    # Each ring from its lowest point, and the rings in order, as coordinate tuples
+    rings = [[(p.x, p.y) for p in ring] for ring in rings]
+    return sorted(ring[ring.index(min(ring)):] + ring[:ring.index(min(ring))] for ring in rings)
+
+def check_offsets(points, holes, distances, h=1e-6):
+    skeleton = StraightSkeleton(points, holes)
+    skeleton.run()
+    edges = [(ring[i - 1], ring[i]) for ring in [points] + list(holes) for i in range(len(ring))]
+    batched = skeleton.offsets(distances)
+    for distance, rings in zip(distances, batched):
+        assert rings, distance
+        # The area shrinks as fast as the perimeter is long
+        slope = (offset_area(skeleton.offset(distance + h)) - offset_area(skeleton.offset(distance - h))) / (2 * h)
+        assert math.isclose(-slope, offset_perimeter(rings), rel_tol=1e-4), distance
+        for ring in rings:
+            for point in ring:
+                assert contains(points, point) and not any(contains(hole, point) for hole in holes), distance
+                # Mitred at the reflex corners, so never nearer than distance to the boundary
+                assert min(point.distanceToSegment(a, b) for a, b in edges) > distance - 1e-7, distance
+        assert canonical_rings(skeleton.offset(distance)) == canonical_rings(rings), distance
+    return batched
+
+def test_offsets_of_a_polygon_with_holes():
+    outline = random_star(24, 7)
+    holes = [[Point(x + 0.4 * math.cos(a), y + 0.4 * math.sin(a)) for a in (0, 2.1, 4.2)][::-1]
+             for x, y in ((-1.0, 0.0), (1.0, 0.5))]
+    rings = check_offsets(outline, holes, [0.5, 0.05, 0.2, 0.1])
+    assert len(rings[1]) == 3
+
+def test_offsets_after_a_split():
+    # Two squares joined by a corridor one unit wide, which splits at half a unit
+    points = [Point(x, y) for x, y in ((0, 0), (4, 0), (4, 1.5), (6, 1.5), (6, 0), (10, 0),
+                                       (10, 4), (6, 4), (6, 2.5), (4, 2.5), (4, 4), (0, 4))]
+    rings = check_offsets(points, [], [0.25, 1.0, 1.5])
+    assert [len(found) for found in rings] == [1, 2, 2]
+
+def test_batch_rejects_degenerate_polygons():
+    from batchSkeleton import skeleton_job
+    for points in ([[0, 0], [1, 0]], [[0, 0], [1, 0], [1, 0], [0, 0]]):
+        result = skeleton_job(("line", points, [], None, None))
+        assert result["status"] == "error" and "3 distinct vertices" in result["error"]
+    assert skeleton_job(("triangle", [[0, 0], [1, 0], [0, 1]], [], None, None))["status"] == "ok"
+
+def crash_on_name(jobs):
+    # Stands in for skeleton_chunk in the workers, a job named crash kills its process
+    import os
+    import batchSkeleton
+    if any(job[0] == "crash" for job in jobs):
+        os._exit(1)
+    return [batchSkeleton.skeleton_job(job) for job in jobs]
+
+def test_batch_survives_a_worker_crash(tmp_path, monkeypatch):
+    import io
+    import json
+    import batchSkeleton
+    monkeypatch.setattr(batchSkeleton, "skeleton_chunk", crash_on_name)
+    names = ["a", "crash"] + [f"b{i}" for i in range(6)]
+    path = tmp_path / "polygons.jsonl"
+    path.write_text("".join(json.dumps({"name": name, "points": [[0, 0], [1, 0], [0, 1]]}) + "\n" for name in names))
+    out = io.StringIO()
+    failures = batchSkeleton.run_batch(str(path), out, workers=1, chunksize=1, window=2)
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [result["name"] for result in results] == names
+    status = {result["name"]: result["status"] for result in results}
+    assert status["crash"] == "error" and status["b5"] == "ok"
+    assert failures == sum(result["status"] != "ok" for result in results)
+
+def test_service_answers_400_to_degenerate_polygons():
+    import asyncio
+    import json
+    from skeletonServer import handle
+    for body in ({"points": [[0, 0], [1, 1]]}, {"a": {"points": [[0, 0], [1, 1], [0, 0]]}},
+                 {"points": [[0, 0], [1, 0], [0, 1]], "holes": [[[0.1, 0.1], [0.2, 0.1]]]}):
+        code, payload, _ = asyncio.run(handle(None, "POST", "/skeleton", {}, json.dumps(body).encode()))
+        assert code == 400 and "3 distinct vertices" in payload["error"]
+
+def test_streamed_arcs_match_the_run_arcs():
+    for points in (random_star(60, 3), polyomino(30, 5), regular_polygon(12, 0)):
+        skeleton = StraightSkeleton(points)
+        skeleton.run()
+        result = skeleton.skeletonResult
+        nodes = list(zip(result.xs, result.ys))
+
+        def node(x, y):
+            # Streamed nodes are not snapped, each one lies within eps of a run node
+            index = min(range(len(nodes)), key=lambda k: (nodes[k][0] - x) ** 2 + (nodes[k][1] - y) ** 2)
+            assert abs(nodes[index][0] - x) < 1e-6 and abs(nodes[index][1] - y) < 1e-6
+            return index
+
+        stats = Instrumentation()
+        streamed = {tuple(sorted((node(*a[:2]), node(*b[:2]))))
+                    for a, b in StraightSkeleton(points, instrumentation=stats).stream()}
+        assert streamed == {tuple(sorted(arc)) for arc in result.arcs}
+        assert set(stats.phases) >= {"event_loop", "leftover"}
+
+def same_tree(a, b, eps=1e-6):
+    # Trees (nodes, arcs) with the same arcs between nodes at the same places
+    (nodesA, arcsA), (nodesB, arcsB) = a, b
+    if len(nodesA) != len(nodesB):
+        return False
+    match = []
+    for x, y in nodesA:
+        index = min(range(len(nodesB)), key=lambda k: (nodesB[k][0] - x) ** 2 + (nodesB[k][1] - y) ** 2)
+        if abs(nodesB[index][0] - x) > eps or abs(nodesB[index][1] - y) > eps:
+            return False
+        match.append(index)
+    return {tuple(sorted((match[i], match[j]))) for i, j in arcsA} == {tuple(sorted(arc)) for arc in arcsB}
+
+def grid_skeleton_of(points, grid):
+    skeleton = StraightSkeleton(points, grid=grid)
+    skeleton.run()
+    result = skeleton.skeletonResult
+    return list(zip(result.xs, result.ys)), list(result.arcs)
+
+def test_grid_and_float_runs_give_the_same_tree():
+    for seed in range(6):
+        points = polyomino(40, seed)
+        assert same_tree(grid_skeleton_of(points, 1.0), skeleton_of(points)), seed
+        assert same_tree(grid_skeleton_of(points, FixedGrid(2.0 ** -20)), skeleton_of(points)), seed
+
+def test_grid_keeps_large_coordinates_exact():
+    # Coordinates in the billions, scaled and moved back they give the float tree of the small copy
+    for seed in range(4):
+        points = polyomino(40, seed)
+        far = [Point(p.x * 1000 + 3e9, p.y * 1000 - 7e9) for p in points]
+        nodes, arcs = grid_skeleton_of(far, 1.0)
+        assert cycles_and_components(nodes, arcs) == (0, 1), seed
+        back = [((x - 3e9) / 1000, (y + 7e9) / 1000) for x, y in nodes]
+        assert same_tree((back, arcs), skeleton_of(points)), seed
+    with pytest.raises(ValueError):
+        StraightSkeleton([Point(0, 0), Point(1e16, 0), Point(0, 1e16)], grid=2.0 ** -20)